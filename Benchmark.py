@@ -0,0 +1,272 @@
+"""
+BENCHMARK SOLVERS
+
+This code runs the solvers with fixed budgets on seeded families of graphs
+and records their wall time, iterations per second, peak memory and gap to
+the best known distance, to tell whether a change makes them faster or
+slower, better or worse.
+
+Results are written as JSON; a stored result file can serve as a baseline
+that later runs are compared against.
+
+Usage:
+python Benchmark.py --output results.json
+python Benchmark.py --output results.json --baseline baseline.json
+python Benchmark.py --output results.json --large
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+import Kernels
+from Exact import held_karp
+from Graphs import generate_geometric_graph, generate_graph
+from Metaheuristics import genetic_algorithm, random_search, simulated_annealing, sub_tour_reversal
+
+# Graph families and sizes run by default.
+DEFAULT_CASES = (('random', 10), ('random', 100), ('random', 1000))
+# Cases added by --large. Graphs of generate_graph() hold about n^2/2 edges, so the large size uses
+# coordinates, which keep memory linear in the number of nodes.
+LARGE_CASES = (('geometric', 10000),)
+
+# Solvers with their fixed budgets; num_trials is the number of iterations.
+SOLVERS = {'random_search': (random_search, {'num_trials': 200}),
+           'sub_tour_reversal': (sub_tour_reversal, {'num_trials': 2000, 'neighbourhood': '2-opt'}),
+           'simulated_annealing': (simulated_annealing, {'num_trials': 2000, 'neighbourhood': '2-opt',
+                                                         'schedule': 'geometric'}),
+           'genetic_algorithm': (genetic_algorithm, {'num_trials': 20, 'population_size': 1.0,
+                                                     'crossover': 'ox'})}
+
+# Largest number of nodes solved exactly with held_karp() to give the optimum as best known distance.
+EXACT_NODES = 12
+# Number of nodes of the graphs every solver is run on once, untimed, before its first timed run.
+WARM_UP_NODES = 50
+
+def make_instance(family, num_nodes, seed_sequence):
+    """
+    Build a seeded graph of a family.
+
+    Input:
+    family: string
+        'random' uses generate_graph() with symmetric distances; 'geometric' uses generate_geometric_graph()
+    num_nodes: int
+        number of nodes
+    seed_sequence: SeedSequence
+        seed of the graph
+
+    Output:
+    graph: ArrayGraph or GeometricGraph
+    """
+    rng = np.random.default_rng(seed_sequence)
+    if family == 'random':
+        return generate_graph(num_nodes, symmetric=True, rng=rng, compact=True)
+    if family == 'geometric':
+        return generate_geometric_graph(num_nodes, rng=rng)
+    raise ValueError('unknown graph family {!r}'.format(family))
+
+def _warm_up(solver, params, family, goal):
+    """
+    Run a solver once, untimed, on a small graph of a family, so compiling the kernels of Kernels on their
+    first call is not counted in the wall time of its first timed run.
+    """
+    node_graph = make_instance(family, WARM_UP_NODES, np.random.SeedSequence(0))
+    solver(1, 1, WARM_UP_NODES, node_graph, goal=goal, rng=np.random.default_rng(0), **params)
+
+def _run_solver(solver, params, node_graph, goal, seed_sequence, measure_memory, num_repeats = 3):
+    """
+    Run one solver num_repeats times for its distance and wall time, the fastest of the repeats as they
+    differ only by the noise of other processes, and once more under tracemalloc for its peak memory.
+    """
+    num_nodes = node_graph.num_nodes
+    wall_time = None
+    for _ in range(num_repeats):
+        start = time.perf_counter()
+        result = solver(1, 1, num_nodes, node_graph, goal=goal, rng=np.random.default_rng(seed_sequence), **params)
+        elapsed = time.perf_counter() - start
+        wall_time = elapsed if wall_time is None else min(wall_time, elapsed)
+    peak_memory = None
+    if measure_memory:
+        tracemalloc.start()
+        solver(1, 1, num_nodes, node_graph, goal=goal, rng=np.random.default_rng(seed_sequence), **params)
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    dist = None if result[1] is None else float(result[1])
+    return dist, wall_time, peak_memory
+
+def run_benchmark(cases = DEFAULT_CASES, solvers = None, num_instances = 3, goal = 'min', seed = 0,
+                  measure_memory = True, verbose = False, num_repeats = 3):
+    """
+    Run every solver on every instance.
+
+    Input:
+    cases: iterable of (family, num_nodes)
+        graph families and sizes, see make_instance()
+    solvers: list of string or None
+        names of SOLVERS to run; None runs them all
+    num_instances: int
+        number of seeded graphs per case
+    goal: string
+        'min' or 'max'
+    seed: int
+        seed of all graphs and solver runs
+    measure_memory: boolean
+        run every solver a second time under tracemalloc to record its peak memory
+    verbose: boolean
+        print every record as it is done
+    num_repeats: int
+        number of timed runs of every solver on every instance; the fastest gives the wall time
+
+    Output:
+    results: dict
+        'meta' describes the run; 'records' holds one dict per solver run with the keys family, num_nodes,
+        instance, solver, dist, wall_time, iterations, iterations_per_sec, peak_memory, best_known and gap
+    """
+    if solvers is None:
+        solvers = list(SOLVERS)
+    records = []
+    warmed_up = set()
+    cases = list(cases)
+    case_seeds = np.random.SeedSequence(seed).spawn(len(cases))
+    for (family, num_nodes), case_seed in zip(cases, case_seeds):
+        for instance, instance_seed in enumerate(case_seed.spawn(num_instances)):
+            graph_seed, solver_seed = instance_seed.spawn(2)
+            node_graph = make_instance(family, num_nodes, graph_seed)
+            best_known = None
+            if num_nodes <= EXACT_NODES:
+                _, best_known = held_karp(1, 1, num_nodes, node_graph, goal)
+                if best_known is None:
+                    # No path exists, so there is nothing for the solvers to find.
+                    continue
+                best_known = float(best_known)
+            instance_records = []
+            for name in solvers:
+                solver, params = SOLVERS[name]
+                if (name, family) not in warmed_up:
+                    _warm_up(solver, params, family, goal)
+                    warmed_up.add((name, family))
+                dist, wall_time, peak_memory = _run_solver(solver, params, node_graph, goal, solver_seed,
+                                                           measure_memory, num_repeats)
+                record = {'family': family, 'num_nodes': num_nodes, 'instance': instance, 'solver': name,
+                          'dist': dist, 'wall_time': wall_time, 'iterations': params['num_trials'],
+                          'iterations_per_sec': params['num_trials']/wall_time if wall_time > 0 else None,
+                          'peak_memory': peak_memory}
+                instance_records.append(record)
+            # Without the optimum, the best distance of any solver is the best known.
+            dists = [record['dist'] for record in instance_records if record['dist'] is not None]
+            if best_known is None and dists:
+                best_known = max(dists) if goal == 'max' else min(dists)
+            for record in instance_records:
+                record['best_known'] = best_known
+                record['gap'] = None
+                if record['dist'] is not None and best_known is not None:
+                    record['gap'] = abs(record['dist'] - best_known)/max(abs(best_known), 1e-12)
+                if verbose:
+                    print(record)
+            records.extend(instance_records)
+    meta = {'goal': goal, 'seed': seed, 'num_instances': num_instances, 'num_repeats': num_repeats, 'cases': cases,
+            'python': platform.python_version(), 'numpy': np.__version__, 'backend': Kernels.BACKEND,
+            'machine': platform.machine(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+    return {'meta': meta, 'records': records}
+
+def _summarise(records):
+    """
+    Average wall time and gap over the instances of every case and solver.
+    """
+    groups = {}
+    for record in records:
+        key = (record['family'], record['num_nodes'], record['solver'])
+        groups.setdefault(key, []).append(record)
+    summary = {}
+    for key, group in groups.items():
+        gaps = [record['gap'] for record in group if record['gap'] is not None]
+        summary[key] = {'wall_time': float(np.mean([record['wall_time'] for record in group])),
+                        'gap': float(np.mean(gaps)) if gaps else None,
+                        'wall_times': {record['instance']: record['wall_time'] for record in group}}
+    return summary
+
+def _mostly_slower(now, before, time_tolerance):
+    """
+    Return whether the wall time grew by more than the tolerance on most instances both runs share.
+    """
+    instances = [instance for instance in now['wall_times'] if instance in before['wall_times']]
+    slower = sum(now['wall_times'][instance] > before['wall_times'][instance]*(1 + time_tolerance)
+                 for instance in instances)
+    return 2*slower > len(instances)
+
+def compare(results, baseline, time_tolerance = 0.25, gap_tolerance = 0.01):
+    """
+    Flag regressions of a benchmark run against a baseline run.
+
+    Input:
+    results, baseline: dict
+        outputs of run_benchmark()
+    time_tolerance: float
+        relative increase of the mean wall time of a case and solver that counts as a regression,
+        when the wall time also grew by as much on most of its instances
+    gap_tolerance: float
+        absolute increase of the mean gap of a case and solver that counts as a regression
+
+    Output:
+    regressions: list of dict
+        family, num_nodes, solver, metric, baseline and current value of every regression
+    """
+    current = _summarise(results['records'])
+    previous = _summarise(baseline['records'])
+    regressions = []
+    for key in sorted(current, key=str):
+        if key not in previous:
+            continue
+        now, before = current[key], previous[key]
+        flagged = []
+        if now['wall_time'] > before['wall_time']*(1 + time_tolerance) and \
+                _mostly_slower(now, before, time_tolerance):
+            flagged.append(('wall_time', before['wall_time'], now['wall_time']))
+        if now['gap'] is not None and before['gap'] is not None and now['gap'] > before['gap'] + gap_tolerance:
+            flagged.append(('gap', before['gap'], now['gap']))
+        for metric, old, new in flagged:
+            regressions.append({'family': key[0], 'num_nodes': key[1], 'solver': key[2], 'metric': metric,
+                                'baseline': old, 'current': new})
+    return regressions
+
+def _parse_case(text):
+    family, _, num_nodes = text.rpartition(':')
+    return (family or 'random', int(num_nodes))
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description='Benchmark the travelling salesman solvers.')
+    parser.add_argument('--output', default='benchmark.json', help='file the results are written to')
+    parser.add_argument('--baseline', help='results file to compare against')
+    parser.add_argument('--cases', nargs='+', type=_parse_case,
+                        help='cases as family:num_nodes, e.g. random:100 geometric:10000')
+    parser.add_argument('--large', action='store_true', help='add the large cases to the default cases')
+    parser.add_argument('--solvers', nargs='+', choices=list(SOLVERS))
+    parser.add_argument('--instances', type=int, default=3, help='number of graphs per case')
+    parser.add_argument('--goal', default='min', choices=['min', 'max'])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true', help='skip the peak memory runs')
+    parser.add_argument('--repeats', type=int, default=3, help='number of timed runs per solver and graph')
+    parser.add_argument('--time-tolerance', type=float, default=0.25)
+    parser.add_argument('--gap-tolerance', type=float, default=0.01)
+    args = parser.parse_args(argv)
+    cases = args.cases or DEFAULT_CASES
+    if args.large:
+        cases = tuple(cases) + LARGE_CASES
+    results = run_benchmark(cases, args.solvers, args.instances, args.goal, args.seed,
+                            not args.no_memory, verbose=True, num_repeats=args.repeats)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=1)
+    if args.baseline is None:
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.time_tolerance, args.gap_tolerance)
+    for regression in regressions:
+        print('REGRESSION {family}:{num_nodes} {solver} {metric}: {baseline:.6g} -> {current:.6g}'.format(**regression))
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
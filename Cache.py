@@ -0,0 +1,236 @@
+"""
+RESULT CACHE
+
+This code implements a cache of solver results keyed by the content of the
+graph, the solver, its parameters and its seed, so solving the same graph
+again with the same settings returns the stored result at once.
+
+Results are kept in an in-memory LRU tier and, optionally, in a directory
+whose total size is bounded by evicting the least recently used files.
+"""
+
+import hashlib
+import inspect
+import os
+import pickle
+from collections import OrderedDict
+import numpy as np
+from Construction import HEURISTICS
+from Exact import branch_and_bound
+from Graphs import GeometricGraph, as_array_graph
+
+def graph_fingerprint(node_graph):
+    """
+    Return a stable SHA-256 hex digest of the content of a graph.
+
+    Input:
+    node_graph: dict, ArrayGraph or GeometricGraph
+        input graph; a dictionary is hashed in its ArrayGraph form
+
+    Output:
+    fingerprint: string
+    """
+    node_graph = as_array_graph(node_graph)
+    digest = hashlib.sha256()
+    if isinstance(node_graph, GeometricGraph):
+        digest.update(b'GeometricGraph')
+        digest.update(np.ascontiguousarray(node_graph.coordinates, dtype=np.float64).tobytes())
+        digest.update(b'rounded' if node_graph.rounded else b'exact')
+    else:
+        digest.update(b'ArrayGraph')
+        for array in (node_graph.indptr, node_graph.indices, node_graph.weights):
+            digest.update(np.ascontiguousarray(array).tobytes())
+            digest.update(b'|')
+    digest.update(repr(node_graph.labels.tolist()).encode())
+    return digest.hexdigest()
+
+def _canonical(value):
+    """
+    Return a stable representation of a parameter value, or raise TypeError when it has none.
+    """
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return repr(value)
+    if isinstance(value, (list, tuple)):
+        return '[' + ','.join(_canonical(item) for item in value) + ']'
+    if isinstance(value, np.random.SeedSequence):
+        return 'SeedSequence({!r},{!r})'.format(value.entropy, value.spawn_key)
+    raise TypeError('{!r} can not be part of a cache key'.format(type(value).__name__))
+
+def _uses_rng(solver, parameters):
+    """
+    Return whether a solver call draws random numbers. Every solver with an rng parameter does, except
+    branch_and_bound(), whose rng only drives its seed heuristic when that heuristic is a random search.
+    """
+    if solver is branch_and_bound:
+        return parameters.get('seed') is not None and parameters.get('seed') not in HEURISTICS
+    return 'rng' in parameters
+
+def result_key(solver, args, kwargs):
+    """
+    Return the cache key of a solver call, or None when the call can not be cached.
+
+    The call can not be cached when its result is not reproducible (it draws random numbers and rng is
+    None or a Generator, or a time limit or stop predicate is set), when it reports more than its
+    solution (a callback or stats) or when a parameter has no stable representation. The rng of a
+    call that draws no random numbers is left out of the key.
+    """
+    try:
+        bound = inspect.signature(solver).bind(*args, **kwargs)
+    except TypeError:
+        return None
+    bound.apply_defaults()
+    parameters = dict(bound.arguments)
+    if not _uses_rng(solver, parameters):
+        parameters.pop('rng', None)
+    elif parameters.get('rng') is None or isinstance(parameters['rng'], np.random.Generator):
+        return None
+    if parameters.get('time_limit') is not None or parameters.get('should_stop') is not None:
+        return None
+    if parameters.get('callback') is not None or parameters.get('stats'):
+        return None
+    node_graph = parameters.pop('node_graph')
+    try:
+        text = ';'.join('{}={}'.format(name, _canonical(value)) for name, value in sorted(parameters.items()))
+    except TypeError:
+        return None
+    digest = hashlib.sha256()
+    for part in (graph_fingerprint(node_graph), solver.__module__, solver.__qualname__, text):
+        digest.update(part.encode())
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+class ResultCache:
+    """
+    Two-tier cache of pickled solver results.
+
+    Input:
+    max_entries: int
+        number of results kept in memory
+    directory: string or None
+        directory of the on-disk tier; None keeps results in memory only
+    max_bytes: int
+        largest total size of the files of the on-disk tier
+    enabled: boolean
+        False bypasses the cache: every call runs the solver and nothing is stored
+    """
+
+    def __init__(self, max_entries = 128, directory = None, max_bytes = 2**30, enabled = True):
+        self.max_entries = max_entries
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def _file(self, key):
+        return os.path.join(self.directory, key + '.pkl')
+
+    def get(self, key):
+        """
+        Return the stored result of a key, or None.
+        """
+        data = self._memory.get(key)
+        if data is not None:
+            self._memory.move_to_end(key)
+        elif self.directory is not None and os.path.exists(self._file(key)):
+            with open(self._file(key), 'rb') as f:
+                data = f.read()
+            # The access time of a file orders the evictions of the on-disk tier.
+            os.utime(self._file(key))
+            self._remember(key, data)
+        if data is None:
+            return None
+        return pickle.loads(data)
+
+    def put(self, key, result):
+        """
+        Store the result of a key in both tiers.
+        """
+        data = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        self._remember(key, data)
+        if self.directory is not None:
+            temporary = self._file(key) + '.tmp'
+            with open(temporary, 'wb') as f:
+                f.write(data)
+            os.replace(temporary, self._file(key))
+            self._evict_files()
+
+    def _remember(self, key, data):
+        self._memory[key] = data
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_files(self):
+        """
+        Delete the least recently used files until the on-disk tier fits in max_bytes.
+        """
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.pkl'):
+                stat = os.stat(os.path.join(self.directory, name))
+                files.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in files)
+        for _, size, name in sorted(files):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.directory, name))
+            total -= size
+
+    def clear(self):
+        """
+        Remove every stored result from both tiers.
+        """
+        self._memory.clear()
+        if self.directory is not None:
+            for name in os.listdir(self.directory):
+                if name.endswith('.pkl'):
+                    os.remove(os.path.join(self.directory, name))
+
+    def solve(self, solver, *args, **kwargs):
+        """
+        Return the result of solver(*args, **kwargs), from the cache when the same graph was solved before
+        with the same solver, parameters and seed.
+        """
+        key = result_key(solver, args, kwargs) if self.enabled else None
+        if key is None:
+            return solver(*args, **kwargs)
+        result = self.get(key)
+        if result is not None:
+            self.hits += 1
+            return result
+        self.misses += 1
+        result = solver(*args, **kwargs)
+        self.put(key, result)
+        return result
+
+# Cache used by cached_solve() unless another one is given.
+DEFAULT_CACHE = ResultCache()
+
+def cached_solve(solver, *args, cache = None, **kwargs):
+    """
+    Run a solver through a ResultCache.
+
+    Input:
+    solver: function
+        a solver of Metaheuristics or Exact, which takes node_graph and rng arguments
+    args, kwargs:
+        arguments of the solver; only reproducible calls (with an int or SeedSequence rng, or that draw no
+        random numbers, such as Exact.branch_and_bound() with seed None or a constructive heuristic)
+        without a callback are cached
+    cache: ResultCache, False or None
+        cache to use; None uses DEFAULT_CACHE and False bypasses caching
+
+    Output:
+    result: the output of the solver
+    """
+    if cache is False:
+        return solver(*args, **kwargs)
+    if cache is None:
+        cache = DEFAULT_CACHE
+    return cache.solve(solver, *args, **kwargs)
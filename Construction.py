@@ -0,0 +1,246 @@
+"""
+CONSTRUCTIVE HEURISTICS
+
+This code implements fast deterministic heuristics that build a complete
+path to start the improvement methods from, instead of a random walk:
+nearest neighbour (farthest neighbour for the longest path), greedy edge
+matching over candidate lists, and the order of the nodes along a Hilbert
+space-filling curve for graphs given by coordinates.
+
+Like the random walk, a path starts at the start node, visits every other
+node once and takes a last step to the end node. On sparse graphs a
+heuristic can fail to close such a path, in which case it finds none.
+"""
+
+import numpy as np
+from Graphs import as_array_graph
+from LocalSearch import candidate_lists
+
+# Number of candidate destinations of every node offered to the greedy edge matching.
+GREEDY_CANDIDATES = 10
+# Number of bits per coordinate of the Hilbert curve grid.
+_CURVE_BITS = 16
+
+def _nearest_neighbour(start_node, end_node, num_nodes, node_graph, goal = 'min'):
+    """
+    Step from every node to its nearest unvisited destination, or its farthest for goal 'max'.
+    The last node before the end node is picked among the nodes with an edge to it. O(n^2).
+    """
+    sign = -1.0 if goal == 'max' else 1.0
+    all_nodes = np.arange(node_graph.num_nodes)
+    to_end = node_graph.distance(all_nodes, np.full(node_graph.num_nodes, end_node))
+    visited = np.zeros(node_graph.num_nodes, dtype=bool)
+    visited[start_node] = True
+    path = [start_node]
+    current_node = start_node
+    for step in range(1, num_nodes):
+        keys = sign * np.array(node_graph.distance_rows([current_node])[0], dtype=np.float64)
+        keys[visited] = np.nan
+        if step == num_nodes - 1:
+            keys[np.isnan(to_end)] = np.nan
+        keys[np.isnan(keys)] = np.inf
+        current_node = int(np.argmin(keys))
+        if keys[current_node] == np.inf:
+            return None
+        visited[current_node] = True
+        path.append(current_node)
+    path.append(end_node)
+    return path
+
+def _find(parent, node):
+    while parent[node] != node:
+        parent[node] = parent[parent[node]]
+        node = parent[node]
+    return node
+
+def _fragment(neighbours, node):
+    """
+    Return the nodes of the undirected fragment that ends at node, starting from node.
+    """
+    fragment = [node]
+    previous = -1
+    while True:
+        following = [other for other in neighbours[fragment[-1]] if other != previous]
+        if not following:
+            return fragment
+        previous = fragment[-1]
+        fragment.append(following[0])
+
+def _greedy_edge(start_node, end_node, num_nodes, node_graph, goal = 'min'):
+    """
+    Add the candidate edges from shortest to longest (longest to shortest for goal 'max') whenever they
+    keep the edges into fragments of a path without closing a cycle, then join the fragments greedily,
+    starting with the one that begins at the start node. On a symmetric graph fragments are undirected
+    and can be joined at either end. O(n k log(n k)) besides the joins.
+    """
+    num_graph_nodes = node_graph.num_nodes
+    candidates = candidate_lists(node_graph, GREEDY_CANDIDATES, goal)
+    rows = np.repeat(np.arange(num_graph_nodes), candidates.shape[1])
+    cols = candidates.ravel()
+    rows, cols = rows[cols >= 0], cols[cols >= 0]
+    weights = node_graph.distance(rows, cols)
+    symmetric = np.array_equal(node_graph.distance(cols, rows), weights)
+    order = np.argsort(-weights if goal == 'max' else weights, kind='stable')
+    # Successors and predecessors of every node; on a symmetric graph both lists hold its neighbours.
+    successors = [[] for _ in range(num_graph_nodes)]
+    predecessors = successors if symmetric else [[] for _ in range(num_graph_nodes)]
+    limit = 2 if symmetric else 1
+    parent = list(range(num_graph_nodes))
+    for u, v in zip(rows[order].tolist(), cols[order].tolist()):
+        if len(successors[u]) >= limit or len(predecessors[v]) >= limit:
+            continue
+        # The start node heads the path, so it has at most one neighbour and nothing leads into it.
+        if symmetric:
+            if start_node in (u, v) and successors[start_node]:
+                continue
+        elif v == start_node:
+            continue
+        root_u, root_v = _find(parent, u), _find(parent, v)
+        if root_u == root_v:
+            continue
+        successors[u].append(v)
+        predecessors[v].append(u)
+        parent[root_u] = root_v
+    # Fragments other than the one of the start node, by every end they can be entered from.
+    path = _fragment(successors, start_node)
+    seen = np.zeros(num_graph_nodes, dtype=bool)
+    seen[path] = True
+    fragments = {}
+    for node in range(num_graph_nodes):
+        if seen[node] or (len(successors[node]) == 2 if symmetric else len(predecessors[node]) == 1):
+            continue
+        fragment = _fragment(successors, node)
+        seen[fragment] = True
+        fragments[node] = fragment
+        if symmetric:
+            fragments[fragment[-1]] = fragment[::-1]
+    sign = -1.0 if goal == 'max' else 1.0
+    while fragments:
+        heads = np.fromiter(fragments, dtype=np.int64, count=len(fragments))
+        keys = sign * node_graph.distance(np.full(len(heads), path[-1]), heads)
+        keys[np.isnan(keys)] = np.inf
+        best = int(np.argmin(keys))
+        if keys[best] == np.inf:
+            return None
+        fragment = fragments.pop(int(heads[best]))
+        fragments.pop(fragment[-1], None)
+        path.extend(fragment)
+    path.append(end_node)
+    return path
+
+def _hilbert_index(x, y):
+    """
+    Return the position of every grid point along a Hilbert curve over a 2^_CURVE_BITS square grid.
+    """
+    size = 1 << _CURVE_BITS
+    index = np.zeros(len(x), dtype=np.int64)
+    x, y = x.copy(), y.copy()
+    s = size // 2
+    while s > 0:
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+        index += s * s * ((3 * rx) ^ ry)
+        # Rotate the quadrant so the curve inside it has the standard orientation.
+        flip = ~ry & rx
+        x[flip] = size - 1 - x[flip]
+        y[flip] = size - 1 - y[flip]
+        swap = ~ry
+        x[swap], y[swap] = y[swap], x[swap]
+        s //= 2
+    return index
+
+def _space_filling_curve(start_node, end_node, num_nodes, node_graph, goal = 'min'):
+    """
+    Visit the nodes in their order along a Hilbert curve, which keeps steps short; for goal 'max'
+    the two halves of the curve are interleaved so every step jumps across it. O(n log n).
+    """
+    coordinates = getattr(node_graph, 'coordinates', None)
+    if coordinates is None:
+        raise ValueError("'space_filling_curve' needs a graph with coordinates, such as a GeometricGraph")
+    low = coordinates.min(axis=0)
+    extent = max(float(np.max(coordinates.max(axis=0) - low)), 1e-300)
+    grid = ((coordinates - low) / extent * ((1 << _CURVE_BITS) - 1)).astype(np.int64)
+    order = np.argsort(_hilbert_index(grid[:, 0], grid[:, 1]), kind='stable')
+    if goal == 'max':
+        half = (len(order) + 1) // 2
+        interleaved = np.empty_like(order)
+        interleaved[0::2] = order[:half]
+        interleaved[1::2] = order[half:]
+        order = interleaved
+    position = int(np.flatnonzero(order == start_node)[0])
+    inner = np.concatenate((order[position + 1:], order[:position]))
+    if len(inner) > 0 and inner[-1] == end_node and not node_graph.has_edge(end_node, end_node):
+        # Only a self-loop could lead from the end node to itself.
+        inner = inner[::-1]
+    return [start_node] + inner.tolist() + [end_node]
+
+# Heuristics by name; each takes node indices and returns a path of node indices or None.
+HEURISTICS = {'nearest_neighbour': _nearest_neighbour,
+              'greedy_edge': _greedy_edge,
+              'space_filling_curve': _space_filling_curve}
+
+def build_tour(start_node, end_node, num_nodes, node_graph, method, goal = 'min'):
+    """
+    Build a path of node indices with a heuristic. Used by the solvers; see construct_tour().
+
+    Input:
+    start_node, end_node: int
+        node indices
+    num_nodes: int
+        number of steps of the path
+    node_graph: ArrayGraph or GeometricGraph
+        input graph
+    method: string
+        name of one of HEURISTICS
+    goal: string
+        'min' or 'max'
+
+    Output:
+    path: list of int or None
+        node indices of the path; None when the heuristic found no path
+    dist: float or None
+        distance of the path
+    """
+    if method not in HEURISTICS:
+        raise ValueError('unknown construction method {!r}; use one of {}'.format(method, sorted(HEURISTICS)))
+    if method != 'nearest_neighbour' and num_nodes != node_graph.num_nodes:
+        raise ValueError('{!r} builds paths over all nodes of the graph'.format(method))
+    path = HEURISTICS[method](start_node, end_node, num_nodes, node_graph, goal)
+    if path is None:
+        return None, None
+    dist = node_graph.path_distance(path)
+    if np.isnan(dist):
+        return None, None
+    return path, dist
+
+def construct_tour(start_node, end_node, num_nodes, node_graph, method = 'nearest_neighbour', goal = 'min'):
+    """
+    Build a path with a constructive heuristic.
+
+    Input:
+    start_node: int
+        starting node of a travelling salesman problem
+    end_node: int
+        end node of a travelling salesman problem
+    num_nodes: int
+        number of nodes of an input graph
+    node_graph: dict, ArrayGraph or GeometricGraph
+        input graph
+    method: string
+        'nearest_neighbour' (O(n^2)), 'greedy_edge' (O(n k log(n k)) after the candidate lists of
+        LocalSearch) or 'space_filling_curve' (O(n log n), GeometricGraph only)
+    goal: string
+        'min' builds a short path, 'max' a long one
+
+    Output:
+    path: list of int or None
+        node labels of the path; None when the heuristic found no path
+    dist: float or None
+        distance of the path
+    """
+    node_graph = as_array_graph(node_graph)
+    path, dist = build_tour(node_graph.index_of(start_node), node_graph.index_of(end_node), num_nodes,
+                            node_graph, method, goal)
+    if path is None:
+        return None, None
+    return node_graph.path_labels(path), dist
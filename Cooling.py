@@ -0,0 +1,186 @@
+"""
+COOLING SCHEDULES
+
+This code implements the temperature schedules of simulated annealing:
+cooling on every accepted move, geometric cooling, Lundy-Mees cooling and
+adaptive cooling that targets a falling acceptance ratio.
+
+Every schedule can be reheated back to its starting temperature.
+"""
+
+import numpy as np
+
+# Number of random numbers drawn from the generator at once.
+_BLOCK_SIZE = 4096
+# Fraction of the starting temperature reached after num_trials moves by the geometric and Lundy-Mees schedules.
+_FINAL_RATIO = 1e-3
+
+class RandomBlock:
+    """
+    Scalar random numbers served from blocks drawn at once from a NumPy random Generator.
+
+    It offers the random(), integers() and choice() calls used by the move generators, so it can be
+    passed where a Generator is expected for scalar draws.
+    """
+
+    def __init__(self, rng, block_size = _BLOCK_SIZE):
+        self.rng = rng
+        self.block_size = block_size
+        self.block = rng.random(block_size)
+        self.position = 0
+
+    def random(self):
+        """
+        Return a uniform random float in [0, 1).
+        """
+        if self.position == self.block_size:
+            self.block = self.rng.random(self.block_size)
+            self.position = 0
+        value = self.block[self.position]
+        self.position += 1
+        return value
+
+    def integers(self, low, high = None):
+        """
+        Return a random integer in [low, high), or in [0, low) when high is None.
+        """
+        if high is None:
+            low, high = 0, low
+        return low + int(self.random()*(high - low))
+
+    def choice(self, options):
+        """
+        Return a random element of a sequence.
+        """
+        return options[self.integers(len(options))]
+
+def accept(cost_delta, temperature, uniform):
+    """
+    Metropolis criterion: accept a move that does not increase the cost, or a worse one with probability
+    exp(-cost_delta/temperature). A temperature of 0 or below only accepts moves that do not increase the cost.
+    """
+    if cost_delta <= 0:
+        return True
+    if temperature <= 0:
+        return False
+    return uniform < np.exp(-cost_delta/temperature)
+
+class CoolingSchedule:
+    """
+    Base class of cooling schedules; update() is called after every move tried.
+    """
+
+    def __init__(self, temperature):
+        self.initial = temperature
+        self.temperature = temperature
+
+    def update(self, accepted):
+        pass
+
+    def reheat(self):
+        """
+        Return to the starting temperature.
+        """
+        self.temperature = self.initial
+
+class AcceptCooling(CoolingSchedule):
+    """
+    Multiply the temperature by cooling_rate whenever a move is accepted.
+    """
+
+    def __init__(self, temperature, num_trials, cooling_rate = None):
+        super().__init__(temperature)
+        self.cooling_rate = 0.8 if cooling_rate is None else cooling_rate
+
+    def update(self, accepted):
+        if accepted:
+            self.temperature *= self.cooling_rate
+
+class GeometricCooling(CoolingSchedule):
+    """
+    Multiply the temperature by cooling_rate after every move; by default the rate that reaches
+    _FINAL_RATIO of the starting temperature after num_trials moves.
+    """
+
+    def __init__(self, temperature, num_trials, cooling_rate = None):
+        super().__init__(temperature)
+        if cooling_rate is None:
+            cooling_rate = _FINAL_RATIO**(1/max(num_trials, 1))
+        self.cooling_rate = cooling_rate
+
+    def update(self, accepted):
+        self.temperature *= self.cooling_rate
+
+class LundyMeesCooling(CoolingSchedule):
+    """
+    Lundy-Mees cooling T = T/(1 + beta*T) after every move; by default the beta that reaches
+    _FINAL_RATIO of the starting temperature after num_trials moves.
+    """
+
+    def __init__(self, temperature, num_trials, cooling_rate = None):
+        super().__init__(temperature)
+        if cooling_rate is None:
+            cooling_rate = (1/_FINAL_RATIO - 1)/(temperature*max(num_trials, 1)) if temperature > 0 else 0.0
+        self.beta = cooling_rate
+
+    def update(self, accepted):
+        self.temperature = self.temperature/(1 + self.beta*self.temperature)
+
+class AdaptiveCooling(CoolingSchedule):
+    """
+    Compare the acceptance ratio of every window of moves with a target that falls linearly from
+    target_acceptance to 0 over num_trials moves; heat up by cooling_rate when too few moves were
+    accepted and cool down otherwise.
+    """
+
+    def __init__(self, temperature, num_trials, cooling_rate = None, target_acceptance = 0.5, window = 100):
+        super().__init__(temperature)
+        self.step = 0.1 if cooling_rate is None else cooling_rate
+        self.num_trials = max(num_trials, 1)
+        self.target_acceptance = target_acceptance
+        self.window = window
+        self.num_moves = 0
+        self.num_accepted = 0
+
+    def update(self, accepted):
+        self.num_moves += 1
+        self.num_accepted += accepted
+        if self.num_moves % self.window == 0:
+            target = self.target_acceptance*max(1 - self.num_moves/self.num_trials, 0)
+            if self.num_accepted/self.window < target:
+                self.temperature *= 1 + self.step
+            else:
+                self.temperature *= 1 - self.step
+            self.num_accepted = 0
+
+    def reheat(self):
+        super().reheat()
+        self.num_accepted = 0
+
+SCHEDULES = {'accept': AcceptCooling,
+             'geometric': GeometricCooling,
+             'lundy-mees': LundyMeesCooling,
+             'adaptive': AdaptiveCooling}
+
+def make_schedule(schedule, temperature, num_trials, cooling_rate = None):
+    """
+    Return a cooling schedule.
+
+    Input:
+    schedule: string or CoolingSchedule
+        'accept', 'geometric', 'lundy-mees' or 'adaptive'; a CoolingSchedule is returned as it is
+    temperature: float
+        starting temperature
+    num_trials: int
+        number of moves the schedule is made for
+    cooling_rate: float or None
+        factor of 'accept' and 'geometric', beta of 'lundy-mees' or step of 'adaptive'; None picks a default
+
+    Output:
+    schedule: CoolingSchedule
+    """
+    if isinstance(schedule, CoolingSchedule):
+        return schedule
+    if schedule not in SCHEDULES:
+        raise ValueError('unknown cooling schedule {!r}'.format(schedule))
+    return SCHEDULES[schedule](temperature, num_trials, cooling_rate)
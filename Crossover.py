@@ -0,0 +1,196 @@
+"""
+CROSSOVER OPERATORS
+
+This code implements order crossover (OX), partially mapped crossover (PMX)
+and edge recombination (ERX) for the genetic algorithm.
+
+Every operator keeps the first and last node of the parents in place and
+recombines the nodes in between, so a child is always a valid permutation.
+Edges missing from a sparse graph are repaired with 2-opt moves afterwards.
+"""
+
+import numpy as np
+from LocalSearch import Tour
+
+def _cut_points(num_inner, rng):
+    """
+    Return two sorted cut points 0 <= a < b <= num_inner.
+    """
+    a, b = np.sort(rng.choice(num_inner + 1, size=2, replace=False))
+    return a, b
+
+def order_crossover(parent1, parent2, rng):
+    """
+    Order crossover: the child keeps a segment of parent1 in place and takes the other nodes in the order
+    they appear in parent2, starting after the segment.
+
+    Input:
+    parent1, parent2: array of int
+        parent paths of node indices with the same first and last node
+    rng: np.random.Generator
+        random generator
+
+    Output:
+    child: array of int
+    """
+    inner1 = parent1[1:-1]
+    inner2 = parent2[1:-1]
+    num_inner = len(inner1)
+    if num_inner < 2:
+        return parent1.copy()
+    a, b = _cut_points(num_inner, rng)
+    in_segment = np.zeros(max(parent1.max(), parent2.max()) + 1, dtype=bool)
+    in_segment[inner1[a:b]] = True
+    order = np.concatenate((inner2[b:], inner2[:b]))
+    child = parent1.copy()
+    child[1 + np.concatenate((np.arange(b, num_inner), np.arange(0, a)))] = order[~in_segment[order]]
+    return child
+
+def partially_mapped_crossover(parent1, parent2, rng):
+    """
+    Partially mapped crossover: the child keeps a segment of parent1 in place and the positions of parent2
+    elsewhere, following the mapping between the two segments where a node would repeat.
+
+    Input:
+    parent1, parent2: array of int
+        parent paths of node indices with the same first and last node
+    rng: np.random.Generator
+        random generator
+
+    Output:
+    child: array of int
+    """
+    inner1 = parent1[1:-1]
+    inner2 = parent2[1:-1]
+    num_inner = len(inner1)
+    if num_inner < 2:
+        return parent1.copy()
+    a, b = _cut_points(num_inner, rng)
+    segment_position = np.full(max(parent1.max(), parent2.max()) + 1, -1, dtype=np.int64)
+    segment_position[inner1[a:b]] = np.arange(a, b)
+    child = parent1.copy()
+    inner = inner2.tolist()
+    for i in np.concatenate((np.arange(0, a), np.arange(b, num_inner))).tolist():
+        node = inner[i]
+        while segment_position[node] >= 0:
+            node = inner[segment_position[node]]
+        child[1 + i] = node
+    return child
+
+def edge_recombination(parent1, parent2, rng):
+    """
+    Edge recombination: the child is built node by node from the edges of both parents, always moving to
+    the neighbour with the fewest unused parent edges left, and to a random node when there is none.
+
+    Input:
+    parent1, parent2: array of int
+        parent paths of node indices with the same first and last node
+    rng: np.random.Generator
+        random generator
+
+    Output:
+    child: array of int
+    """
+    inner1 = parent1[1:-1].tolist()
+    inner2 = parent2[1:-1].tolist()
+    num_inner = len(inner1)
+    if num_inner < 2:
+        return parent1.copy()
+    neighbours = {node: set() for node in inner1}
+    for inner in (inner1, inner2):
+        for k in range(num_inner - 1):
+            neighbours[inner[k]].add(inner[k + 1])
+            neighbours[inner[k + 1]].add(inner[k])
+    # Unvisited nodes with their list position, so a random one is removed in O(1).
+    remaining = list(inner1)
+    remaining_position = {node: k for k, node in enumerate(remaining)}
+    current = inner1[0]
+    inner = []
+    while True:
+        inner.append(current)
+        last = remaining.pop()
+        if last != current:
+            remaining[remaining_position[current]] = last
+            remaining_position[last] = remaining_position[current]
+        del remaining_position[current]
+        if not remaining:
+            break
+        options = neighbours.pop(current)
+        for node in options:
+            neighbours[node].discard(current)
+        if options:
+            options = list(options)
+            fewest = min(len(neighbours[node]) for node in options)
+            options = [node for node in options if len(neighbours[node]) == fewest]
+            current = options[rng.integers(len(options))]
+        else:
+            current = remaining[rng.integers(len(remaining))]
+    child = parent1.copy()
+    child[1:-1] = inner
+    return child
+
+# Crossover operators selectable by name.
+CROSSOVERS = {'ox': order_crossover, 'pmx': partially_mapped_crossover, 'erx': edge_recombination}
+
+def repair(path, node_graph):
+    """
+    Remove missing edges from a path with 2-opt moves.
+
+    Every move reverses the part of the path after a missing edge up to a neighbour of the node before it,
+    and is only applied when all its edges exist, so each move removes at least one missing edge.
+
+    Input:
+    path: array of int
+        node indices of a path
+    node_graph: ArrayGraph or GeometricGraph
+        input graph
+
+    Output:
+    path: array of int or None
+        the repaired path, or None when a missing edge cannot be removed
+    """
+    tour = Tour(path, node_graph)
+    while True:
+        missing = np.flatnonzero(~node_graph.has_edge(tour.path[:-1], tour.path[1:]))
+        if len(missing) == 0:
+            return tour.path
+        k = missing[0]
+        ends = tour.pos[node_graph.neighbours(tour.path[k])]
+        ends = ends[(ends > k + 1) & (ends < tour.num_steps)]
+        for j in ends.tolist():
+            if tour.two_opt_feasible(k + 1, j):
+                tour.apply_two_opt(k + 1, j)
+                break
+        else:
+            return None
+
+def make_child(parent1, parent2, node_graph, crossover, mutation_rate, rng):
+    """
+    Produce a feasible child with a crossover operator, random swap mutations and repair.
+
+    Input:
+    parent1, parent2: array of int
+        feasible parent paths of node indices
+    node_graph: ArrayGraph or GeometricGraph
+        input graph
+    crossover: string
+        'ox', 'pmx' or 'erx'
+    mutation_rate: float
+        probability that a node of the child swaps its position with a random node
+    rng: np.random.Generator
+        random generator
+
+    Output:
+    child: array of int
+        child path; a copy of parent1 when the child cannot be repaired
+    """
+    child = CROSSOVERS[crossover](parent1, parent2, rng)
+    num_inner = len(child) - 2
+    if num_inner > 1:
+        positions = 1 + np.flatnonzero(rng.random(num_inner) < mutation_rate)
+        for i, j in zip(positions.tolist(), (1 + rng.integers(num_inner, size=len(positions))).tolist()):
+            child[i], child[j] = child[j], child[i]
+    repaired = repair(child, node_graph)
+    if repaired is None:
+        return parent1.copy()
+    return repaired
@@ -0,0 +1,314 @@
+"""
+EXACT ALGORITHMS
+
+This code implements exact solvers for small travelling salesman problems,
+which give the true optimum the metaheuristic algorithms can be compared to.
+
+Held-Karp dynamic programming works over subsets of nodes stored as
+bitmasks and is vectorized with NumPy over all subsets of the same size.
+Branch and bound reaches larger problems, proving optimality or giving
+the gap to the optimum when its time runs out.
+"""
+
+import math
+import time
+import numpy as np
+from Graphs import as_array_graph
+from Construction import HEURISTICS, construct_tour
+from Metaheuristics import simulated_annealing, sub_tour_reversal
+
+def _next_layer(layer, num_bits):
+    """
+    Return the masks with one bit more set than the masks of layer, in ascending order when layer is:
+    every mask of layer with one bit added above its highest set bit, so every mask appears once.
+    """
+    return np.concatenate([layer[:np.searchsorted(layer, 1 << bit)] | (1 << bit) for bit in range(num_bits)])
+
+def _mask_rank(mask, num_bits):
+    """
+    Return the position of a mask among the ascending masks with the same number of bits set.
+    """
+    rank = 0
+    count = 0
+    for bit in range(num_bits):
+        if (mask >> bit) & 1:
+            count += 1
+            rank += math.comb(bit, count)
+    return rank
+
+def _cost_matrix(node_graph, goal):
+    """
+    Return the distance matrix turned into costs to minimise, with inf for missing edges.
+    """
+    cost = np.array(node_graph.to_matrix(), dtype=np.float64)
+    if goal == 'max':
+        cost = -cost
+    cost[np.isnan(cost)] = np.inf
+    return cost
+
+def held_karp(start_node, end_node, num_nodes, node_graph, goal = 'max', max_nodes = 25):
+    """
+    Implementation of the Held-Karp dynamic programming algorithm to find the longest or shortest solution.
+
+    The path starts at start_node, visits every node once and then takes a last step to end_node, as the
+    paths of the metaheuristic algorithms do; with end_node equal to start_node this is a tour.
+    Only the values of two consecutive subset sizes are kept in memory, as float64, and the choices made
+    as int8 arrays of 2^(n-1) * (n-1) bytes in all. Memory peaks at the largest subset sizes, at about
+    100 MB for 21 nodes, and doubles with every node: about 1.7 GB for 25 nodes. Time grows as n^2 2^n.
+
+    Input:
+    start_node: int
+        starting node of a travelling salesman problem
+    end_node: int
+        end node of a travelling salesman problem
+    num_nodes: int
+        number of nodes of an input graph
+    node_graph: dict, ArrayGraph or GeometricGraph
+        input graph
+    goal: string
+        use 'max' to return the longest or 'min' to return the shortest path
+    max_nodes: int
+        largest number of nodes accepted, to guard memory and time
+
+    Output:
+    best_path: list of int or None
+        a list of integers representing nodes of the optimal path; None when no path exists
+    best_dist: int or float or None
+        distance of the optimal path
+    """
+    node_graph = as_array_graph(node_graph)
+    if node_graph.num_nodes != num_nodes:
+        raise ValueError('num_nodes does not match the number of nodes of node_graph')
+    if num_nodes > max_nodes:
+        raise ValueError('held_karp() accepts at most {} nodes'.format(max_nodes))
+    start = node_graph.index_of(start_node)
+    end = node_graph.index_of(end_node)
+    cost = _cost_matrix(node_graph, goal)
+    # Bit b of a mask stands for node others[b]; the start node is always visited first.
+    others = np.array([node for node in range(num_nodes) if node != start], dtype=np.int64)
+    num_bits = len(others)
+    if num_bits == 0:
+        if np.isinf(cost[start, end]):
+            return None, None
+        return node_graph.path_labels([start, end]), node_graph.distance(start, end)
+    inner_cost = cost[np.ix_(others, others)]
+    last_cost = cost[others, end]
+    # Paths over one node: the first step from the start node. A layer holds the masks of one size, ascending.
+    layer = _next_layer(np.zeros(1, dtype=np.int64), num_bits)
+    values = np.full((num_bits, num_bits), np.inf)
+    values[np.arange(num_bits), np.arange(num_bits)] = cost[start, others]
+    choices = [None, None]
+    for k in range(2, num_bits + 1):
+        previous_layer, layer = layer, _next_layer(layer, num_bits)
+        new_values = np.full((len(layer), num_bits), np.inf)
+        choice = np.full((len(layer), num_bits), -1, dtype=np.int8)
+        for v in range(num_bits):
+            has_v = np.flatnonzero((layer >> v) & 1)
+            previous = np.searchsorted(previous_layer, layer[has_v] ^ (1 << v))
+            candidates = values[previous]
+            candidates += inner_cost[:, v]
+            best = np.argmin(candidates, axis=1)
+            new_values[has_v, v] = candidates[np.arange(len(has_v)), best]
+            choice[has_v, v] = best
+        values = new_values
+        choices.append(choice)
+    total = values[0] + last_cost
+    last = int(np.argmin(total))
+    if np.isinf(total[last]):
+        return None, None
+    # Walk the choices back from the full mask.
+    sequence = [last]
+    mask = (1 << num_bits) - 1
+    for k in range(num_bits, 1, -1):
+        previous_node = int(choices[k][_mask_rank(mask, num_bits), sequence[-1]])
+        mask ^= 1 << sequence[-1]
+        sequence.append(previous_node)
+    path = [start] + others[sequence[::-1]].tolist() + [end]
+    return node_graph.path_labels(path), node_graph.path_distance(path)
+
+def _reduced_bounds(cost_so_far, last, remaining, inner_cost, final_cost):
+    """
+    Return reduced cost matrix lower bounds of the children of a partial path, one for every remaining node.
+
+    A child extends the path ending at last with one remaining node c. What is left of it is an assignment
+    from the remaining nodes to their successors: other remaining nodes or the final step to the end node.
+    The sum of the row and column minima of that cost matrix bounds every completion from below.
+    """
+    k = len(remaining)
+    first_step = inner_cost[last, remaining]
+    # Rows are the remaining nodes; columns are the remaining nodes followed by the final step.
+    base = np.empty((k, k + 1))
+    base[:, :k] = inner_cost[np.ix_(remaining, remaining)]
+    base[:, k] = final_cost[remaining]
+    matrix = np.repeat(base[None, :, :], k, axis=0)
+    children = np.arange(k)
+    # Child c can no longer be a successor, and can not take the final step before the others.
+    matrix[children, :, children] = np.inf
+    if k > 1:
+        matrix[children, children, k] = np.inf
+    row_min = matrix.min(axis=2)
+    feasible = np.isfinite(row_min).all(axis=1) & np.isfinite(first_step)
+    row_min[~feasible] = 0
+    with np.errstate(invalid='ignore'):
+        col_min = (matrix - row_min[:, :, None]).min(axis=1)
+    col_min[children, children] = 0
+    feasible &= np.isfinite(col_min).all(axis=1)
+    col_min[~feasible] = 0
+    bounds = cost_so_far + first_step + row_min.sum(axis=1) + col_min.sum(axis=1)
+    bounds[~feasible] = np.inf
+    return bounds
+
+def _one_tree_bound(last, remaining, inner_cost, final_cost):
+    """
+    Return the 1-tree lower bound of completing a path from last over the remaining nodes on a symmetric graph.
+
+    Removing the first and the final step of the completion leaves a path over the remaining nodes, which
+    weighs at least as much as their minimum spanning tree.
+    """
+    k = len(remaining)
+    first = inner_cost[last, remaining].min()
+    final = final_cost[remaining].min()
+    # Prim's algorithm on the remaining nodes.
+    sub = inner_cost[np.ix_(remaining, remaining)]
+    in_tree = np.zeros(k, dtype=bool)
+    in_tree[0] = True
+    link = sub[0].copy()
+    tree = 0.0
+    for _ in range(k - 1):
+        link[in_tree] = np.inf
+        node = int(np.argmin(link))
+        if np.isinf(link[node]):
+            return np.inf
+        tree += link[node]
+        in_tree[node] = True
+        link = np.minimum(link, sub[node])
+    return first + tree + final
+
+def branch_and_bound(start_node, end_node, num_nodes, node_graph, goal = 'max', time_limit = None,
+                     bound = 'reduced', seed = 'sub_tour_reversal', seed_trials = 1000, rng = None, callback = None,
+                     should_stop = None):
+    """
+    Implementation of a depth-first branch and bound algorithm to find the longest or shortest solution.
+
+    Paths follow the same start_node and end_node semantics as held_karp(). Partial paths are extended
+    one node at a time, closest (or farthest for 'max') children first, and pruned when their lower
+    bound can not beat the best path found so far. The search is anytime: when time_limit runs out, the
+    best path found so far is returned with the relative gap to the best bound of the unexplored paths.
+
+    Input:
+    start_node: int
+        starting node of a travelling salesman problem
+    end_node: int
+        end node of a travelling salesman problem
+    num_nodes: int
+        number of nodes of an input graph
+    node_graph: dict, ArrayGraph or GeometricGraph
+        input graph
+    goal: string
+        use 'max' to return the longest or 'min' to return the shortest path
+    time_limit: float or None
+        number of seconds after which the search stops; None searches until optimality is proven
+    bound: string
+        'reduced' uses reduced cost matrix bounds; 'one-tree' adds 1-tree bounds, which needs a
+        symmetric graph; 'reduced' works on any graph
+    seed: string or None
+        heuristic giving the first best path, 'sub_tour_reversal' (2-opt and Or-opt local search),
+        'simulated_annealing' or a constructive heuristic of Construction.HEURISTICS; None starts without one
+    seed_trials: int
+        number of moves of the seeding heuristic, which stops early when time_limit runs out
+    rng: None, int, SeedSequence or Generator
+        random generator or seed of the seeding heuristic, see Graphs.make_rng()
+    callback: function or None
+        called as callback(best_path, best_dist) with every new best path; returning True stops the search
+    should_stop: function or None
+        called without arguments before every node is expanded, and by the seeding heuristic;
+        returning True stops the search
+
+    Output:
+    best_path: list of int or None
+        a list of integers representing nodes of the best path; None when no path was found
+    best_dist: int or float or None
+        distance of the best path
+    gap: float or None
+        relative difference between best_dist and the bound on the optimum; 0.0 when best_path is
+        proven optimal or no path is proven to exist, None when time ran out before a path was found
+    """
+    node_graph = as_array_graph(node_graph)
+    if node_graph.num_nodes != num_nodes:
+        raise ValueError('num_nodes does not match the number of nodes of node_graph')
+    if bound not in ('reduced', 'one-tree'):
+        raise ValueError("bound must be 'reduced' or 'one-tree'")
+    start = node_graph.index_of(start_node)
+    end = node_graph.index_of(end_node)
+    cost = _cost_matrix(node_graph, goal)
+    final_cost = cost[:, end].copy()
+    inner_cost = cost.copy()
+    np.fill_diagonal(inner_cost, np.inf)
+    if bound == 'one-tree' and not np.array_equal(inner_cost, inner_cost.T):
+        raise ValueError("bound 'one-tree' needs a symmetric graph")
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+    sign = -1 if goal == 'max' else 1
+    remaining = np.array([node for node in range(num_nodes) if node != start], dtype=np.int64)
+    root = _reduced_bounds(0.0, start, remaining, inner_cost, final_cost) if len(remaining) else [cost[start, end]]
+    if np.isinf(np.min(root)):
+        return None, None, 0.0
+    best_path, best_cost = None, np.inf
+    if seed is not None:
+        # The seeding heuristic shares the time limit; when it uses it all, its path is returned with the gap.
+        time_left = None if deadline is None else max(deadline - time.perf_counter(), 0.0)
+        heuristics = {'sub_tour_reversal': lambda: sub_tour_reversal(start_node, end_node, num_nodes, node_graph,
+                                                                     seed_trials, goal, rng, 'both', 'first',
+                                                                     time_limit=time_left, should_stop=should_stop),
+                      'simulated_annealing': lambda: simulated_annealing(start_node, end_node, num_nodes,
+                                                                         node_graph, seed_trials, goal, rng,
+                                                                         'both', time_limit=time_left,
+                                                                         should_stop=should_stop)}
+        for name in HEURISTICS:
+            heuristics[name] = lambda name=name: construct_tour(start_node, end_node, num_nodes, node_graph, name,
+                                                                'max' if goal == 'max' else 'min')
+        path, _ = heuristics[seed]()
+        # The heuristic finds no path when a feasibility test proves that none exists.
+        if path is not None:
+            best_path = node_graph.path_indices(path)
+            best_cost = sign * node_graph.path_distance(best_path)
+            if callback is not None and callback(path, node_graph.path_distance(best_path)):
+                deadline = 0
+    # Every entry of the stack is the bound, the cost and the nodes of a partial path.
+    stack = [(np.min(root), 0.0, [start])]
+    while stack:
+        if deadline is not None and time.perf_counter() > deadline:
+            break
+        if should_stop is not None and should_stop():
+            break
+        path_bound, cost_so_far, path = stack.pop()
+        if path_bound >= best_cost:
+            continue
+        last = path[-1]
+        visited = np.zeros(num_nodes, dtype=bool)
+        visited[path] = True
+        remaining = np.flatnonzero(~visited)
+        if bound == 'one-tree' and len(remaining) > 1:
+            if cost_so_far + _one_tree_bound(last, remaining, inner_cost, final_cost) >= best_cost:
+                continue
+        bounds = _reduced_bounds(cost_so_far, last, remaining, inner_cost, final_cost)
+        if len(remaining) == 1:
+            # The only child is a complete path and its bound is its cost.
+            if bounds[0] < best_cost:
+                best_path, best_cost = path + [int(remaining[0]), end], bounds[0]
+                if callback is not None and callback(node_graph.path_labels(best_path),
+                                                     node_graph.path_distance(best_path)):
+                    deadline = 0
+            continue
+        # Push the worst children first so that the best is expanded next.
+        for child in np.argsort(-bounds, kind='stable'):
+            if bounds[child] < best_cost:
+                node = int(remaining[child])
+                stack.append((bounds[child], cost_so_far + inner_cost[last, node], path + [node]))
+    if best_path is None:
+        return None, None, (0.0 if not stack else None)
+    open_bounds = [entry[0] for entry in stack if entry[0] < best_cost]
+    best_dist = node_graph.path_distance(best_path)
+    gap = 0.0
+    if open_bounds:
+        gap = float((best_cost - min(open_bounds))/max(abs(best_cost), 1e-12))
+    return node_graph.path_labels(best_path), best_dist, gap
@@ -0,0 +1,248 @@
+"""
+FEASIBILITY CHECKS
+
+This code implements cheap tests that prove a graph has no path from the
+start node over all nodes to the end node, to be run before a solver
+spends its trials on it.
+
+A path visits every node once and then takes a last step to the end node;
+with the end node equal to the start node it is a Hamiltonian cycle. The
+tests are necessary conditions: minimum degree, connectivity, cut vertices
+and the balance of bipartite graphs. Passing them does not prove that a path
+exists; for small graphs an optional exact check settles the question.
+"""
+
+import numpy as np
+from Graphs import GeometricGraph, as_array_graph
+
+# Tests run by check_feasibility() unless others are given, cheapest first.
+TESTS = ('min_degree', 'disconnected', 'bipartite_imbalance', 'cut_vertex')
+# Tests with vectorized NumPy implementations, which take linear time in the number of edges.
+FAST_TESTS = ('min_degree', 'disconnected', 'bipartite_imbalance')
+
+def _unique(values):
+    """
+    Return the sorted distinct values of an integer array; sorting is faster than hashing for large arrays.
+    """
+    values = np.sort(values)
+    return values[np.concatenate(([True], values[1:] != values[:-1]))] if len(values) else values
+
+def _gather(indptr, indices, nodes):
+    """
+    Return the destinations of all given nodes of a CSR adjacency, concatenated.
+    """
+    starts = indptr[nodes]
+    counts = indptr[nodes + 1] - starts
+    positions = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+    return indices[positions]
+
+def _reachable(indptr, indices, sources):
+    """
+    Return a boolean array of the nodes reachable from the sources, by a level-synchronous search.
+    """
+    seen = np.zeros(len(indptr) - 1, dtype=bool)
+    frontier = _unique(np.asarray(sources, dtype=np.int64))
+    seen[frontier] = True
+    while len(frontier) > 0:
+        destinations = _gather(indptr, indices, frontier)
+        frontier = _unique(destinations[~seen[destinations]])
+        seen[frontier] = True
+    return seen
+
+def _csr(rows, cols, num_nodes):
+    """
+    Return the CSR adjacency (indptr, indices) of the given edges.
+    """
+    indptr = np.concatenate(([0], np.cumsum(np.bincount(rows, minlength=num_nodes))))
+    if np.all(rows[1:] >= rows[:-1]):
+        # The edges of a CSR adjacency come sorted by row already.
+        return indptr, cols
+    # A stable sort of 16-bit integers is a radix sort, which takes linear time.
+    keys = rows.astype(np.uint16) if num_nodes <= 1 << 16 else rows
+    return indptr, cols[np.argsort(keys, kind='stable')]
+
+def _undirected(rows, cols, num_nodes):
+    """
+    Return the edges without self-loops in both directions, each once, and their CSR adjacency.
+    """
+    keep = rows != cols
+    both_rows = np.concatenate((rows[keep], cols[keep]))
+    both_cols = np.concatenate((cols[keep], rows[keep]))
+    keys = _unique(both_rows * num_nodes + both_cols)
+    rows, cols = keys // num_nodes, keys % num_nodes
+    return rows, cols, _csr(rows, cols, num_nodes)
+
+def _min_degree(start, end, rows, cols, num_nodes):
+    """
+    Every node needs a successor, and every node but the start a predecessor; only the last
+    step may use a self-loop, and only at the end node.
+    """
+    proper = rows != cols
+    out_degree = np.bincount(rows[proper], minlength=num_nodes)
+    in_degree = np.bincount(cols[proper], minlength=num_nodes)
+    if np.any((rows == end) & (cols == end)):
+        out_degree[end] += 1
+    needs_predecessor = np.ones(num_nodes, dtype=bool)
+    if start != end:
+        needs_predecessor[start] = False
+    return bool(np.all(out_degree > 0) and np.all(in_degree[needs_predecessor] > 0))
+
+def _connected(start, end, rows, cols, num_nodes):
+    """
+    Every node must be reachable from the start node and must reach a predecessor of the end node.
+    """
+    indptr, indices = _csr(rows, cols, num_nodes)
+    if not np.all(_reachable(indptr, indices, [start])):
+        return False
+    last = rows[(cols == end) & ((rows != end) | (start != end))]
+    if len(last) == 0:
+        return False
+    reverse_indptr, reverse_indices = _csr(cols, rows, num_nodes)
+    return bool(np.all(_reachable(reverse_indptr, reverse_indices, last)))
+
+def _bipartite_balanced(start, end, rows, cols, num_nodes):
+    """
+    In a bipartite graph a path alternates between the two sides, so their sizes may differ by at
+    most one, the start node must be on the larger side, and the last step must cross to the other side.
+    """
+    end_loop = bool(np.any((rows == end) & (cols == end)))
+    proper = rows != cols
+    rows, cols = rows[proper], cols[proper]
+    # Sides are coloured over edges in both directions; repeated destinations are dropped per level.
+    indptr, indices = _csr(rows, cols, num_nodes)
+    reverse_indptr, reverse_indices = _csr(cols, rows, num_nodes)
+    side = np.full(num_nodes, -1, dtype=np.int64)
+    for root in range(num_nodes):
+        if side[root] >= 0:
+            continue
+        side[root] = 0
+        frontier = np.array([root], dtype=np.int64)
+        level = 0
+        while len(frontier) > 0:
+            level += 1
+            destinations = np.concatenate((_gather(indptr, indices, frontier),
+                                           _gather(reverse_indptr, reverse_indices, frontier)))
+            frontier = _unique(destinations[side[destinations] < 0])
+            side[frontier] = level % 2
+    if np.any(side[rows] == side[cols]):
+        # Not bipartite, so the test does not apply.
+        return True
+    # Flip the sides so the start node is on side 0.
+    side ^= side[start]
+    size = np.bincount(side, minlength=2)
+    expected = (num_nodes + 1) // 2
+    if size[0] != expected:
+        return False
+    # The last node of the path is on the start side when the number of nodes is odd.
+    last_side = 0 if num_nodes % 2 == 1 else 1
+    if start == end:
+        return last_side == 1
+    # A path may also end at the end node itself and take its self-loop as the last step.
+    return bool(side[end] != last_side or end_loop)
+
+def _articulation_counts(indptr, indices, num_nodes):
+    """
+    Return, for every node, the number of components its removal leaves of its component.
+    """
+    # Every node but a root of the search also keeps the part of its component above it.
+    components = np.ones(num_nodes, dtype=np.int64)
+    discovery = np.full(num_nodes, -1, dtype=np.int64)
+    low = np.zeros(num_nodes, dtype=np.int64)
+    indptr = indptr.tolist()
+    indices = indices.tolist()
+    time = 0
+    for root in range(num_nodes):
+        if discovery[root] >= 0:
+            continue
+        components[root] = 0
+        discovery[root] = low[root] = time
+        time += 1
+        # Iterative depth-first search; every entry is a node, its parent and its next edge position.
+        stack = [(root, -1, indptr[root])]
+        while stack:
+            node, parent, position = stack[-1]
+            if position < indptr[node + 1]:
+                stack[-1] = (node, parent, position + 1)
+                child = indices[position]
+                if discovery[child] < 0:
+                    discovery[child] = low[child] = time
+                    time += 1
+                    stack.append((child, node, indptr[child]))
+                elif child != parent:
+                    low[node] = min(low[node], discovery[child])
+                continue
+            stack.pop()
+            if parent >= 0:
+                low[parent] = min(low[parent], low[node])
+                # The subtree of node is cut off from the rest when parent is removed.
+                if low[node] >= discovery[parent]:
+                    components[parent] += 1
+    return components
+
+def _no_cut_vertex(start, end, rows, cols, num_nodes):
+    """
+    Removing a node splits a path into at most two pieces, and removing its start node into one;
+    a cycle stays in one piece. Counted on the graph with edges in both directions.
+    """
+    if num_nodes < 3:
+        return True
+    _, _, (indptr, indices) = _undirected(rows, cols, num_nodes)
+    counts = _articulation_counts(indptr, indices, num_nodes)
+    if start == end:
+        return bool(np.all(counts <= 1))
+    return bool(np.all(counts <= 2) and counts[start] <= 1)
+
+_CHECKS = {'min_degree': _min_degree,
+           'disconnected': _connected,
+           'bipartite_imbalance': _bipartite_balanced,
+           'cut_vertex': _no_cut_vertex}
+
+def check_feasibility(start_node, end_node, num_nodes, node_graph, tests = TESTS, exact_nodes = None):
+    """
+    Test whether a path can exist from start_node over all nodes to end_node.
+
+    Input:
+    start_node: int
+        starting node of a travelling salesman problem
+    end_node: int
+        end node of a travelling salesman problem
+    num_nodes: int
+        number of nodes of an input graph
+    node_graph: dict, ArrayGraph or GeometricGraph
+        input graph
+    tests: tuple of string
+        necessary conditions to test, from TESTS
+    exact_nodes: int or None
+        run Exact.held_karp() on graphs of at most this many nodes that pass the tests
+
+    Output:
+    feasible: boolean or None
+        False when a test proves that no path exists, True when the exact check found one,
+        None when the tests passed without proving it
+    reason: string or None
+        name of the test that failed, or 'exact' when the exact check found no path
+    """
+    node_graph = as_array_graph(node_graph)
+    if num_nodes != node_graph.num_nodes:
+        # The tests assume that the path visits every node of the graph.
+        return None, None
+    start = node_graph.index_of(start_node)
+    end = node_graph.index_of(end_node)
+    if isinstance(node_graph, GeometricGraph):
+        # A complete graph only lacks self-loops, which only matter for a single node.
+        if num_nodes == 1:
+            return False, 'min_degree'
+        return (True, None) if num_nodes > 2 or start == end else (None, None)
+    rows = np.repeat(np.arange(num_nodes, dtype=np.int64), np.diff(node_graph.indptr))
+    cols = node_graph.indices
+    for test in tests:
+        if not _CHECKS[test](start, end, rows, cols, num_nodes):
+            return False, test
+    if exact_nodes is not None and num_nodes <= exact_nodes:
+        # Imported here because Exact depends on the solvers, which depend on this module.
+        from Exact import held_karp
+        path, _ = held_karp(start_node, end_node, num_nodes, node_graph, 'min')
+        if path is None:
+            return False, 'exact'
+        return True, None
+    return None, None
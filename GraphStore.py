@@ -0,0 +1,262 @@
+"""
+GRAPH FILES
+
+This code reads and writes graphs as TSPLIB files (EXPLICIT distance
+matrices and EUC_2D coordinates) and in a native binary format of .npy
+arrays that is loaded memory-mapped.
+
+Graphs are loaded straight into the ArrayGraph or GeometricGraph form the
+solvers use. A memory-mapped graph is passed to worker processes as the
+name of its directory, so every process maps the same files and shares
+one copy of a large distance matrix through the page cache.
+"""
+
+import json
+import os
+import re
+import numpy as np
+from Graphs import ArrayGraph, GeometricGraph, NO_EDGE
+
+# Formats of EXPLICIT TSPLIB matrices, as the triangle indices their values fill in order. Column-wise
+# formats list a symmetric matrix in the order of the opposite row-wise triangle.
+_TRIANGLES = {'UPPER_ROW': (np.triu_indices, 1), 'LOWER_ROW': (np.tril_indices, -1),
+              'UPPER_DIAG_ROW': (np.triu_indices, 0), 'LOWER_DIAG_ROW': (np.tril_indices, 0),
+              'UPPER_COL': (np.tril_indices, -1), 'LOWER_COL': (np.triu_indices, 1),
+              'UPPER_DIAG_COL': (np.tril_indices, 0), 'LOWER_DIAG_COL': (np.triu_indices, 0)}
+
+_SECTION = re.compile(r'^[ \t]*([A-Z_]+_SECTION|EOF)[ \t]*:?[ \t]*$', re.MULTILINE)
+
+def _parse_tsplib(text):
+    """
+    Return the specification entries and the section bodies of a TSPLIB file.
+    """
+    markers = list(_SECTION.finditer(text))
+    header_end = markers[0].start() if markers else len(text)
+    specification = {}
+    for line in text[:header_end].splitlines():
+        key, separator, value = line.partition(':')
+        if separator:
+            specification[key.strip().upper()] = value.strip()
+    sections = {}
+    for k, marker in enumerate(markers):
+        if marker.group(1) == 'EOF':
+            break
+        stop = markers[k + 1].start() if k + 1 < len(markers) else len(text)
+        sections[marker.group(1)] = text[marker.end():stop]
+    return specification, sections
+
+def _numbers(body):
+    """
+    Return the whitespace separated numbers of a section body as floats.
+    """
+    return np.fromstring(body, dtype=np.float64, sep=' ')
+
+def _explicit_matrix(values, num_nodes, weight_format):
+    """
+    Return the square matrix of the values of an EDGE_WEIGHT_SECTION.
+    """
+    if weight_format == 'FULL_MATRIX':
+        if len(values) != num_nodes * num_nodes:
+            raise ValueError('FULL_MATRIX holds {} values, not {}'.format(len(values), num_nodes * num_nodes))
+        return values.reshape(num_nodes, num_nodes).copy()
+    if weight_format not in _TRIANGLES:
+        raise ValueError('unsupported EDGE_WEIGHT_FORMAT {!r}'.format(weight_format))
+    triangle, offset = _TRIANGLES[weight_format]
+    rows, cols = triangle(num_nodes, offset)
+    if len(values) != len(rows):
+        raise ValueError('{} holds {} values, not {}'.format(weight_format, len(values), len(rows)))
+    matrix = np.zeros((num_nodes, num_nodes))
+    matrix[rows, cols] = values
+    matrix[cols, rows] = values
+    return matrix
+
+def read_tsplib(path, missing = None, dense = True, as_dict = False):
+    """
+    Read a TSP or ATSP instance from a TSPLIB file.
+
+    Input:
+    path: string
+        TSPLIB file with EDGE_WEIGHT_TYPE EXPLICIT (any EDGE_WEIGHT_FORMAT of a matrix) or EUC_2D
+    missing: int, float or None
+        weight of an EXPLICIT matrix that marks a missing edge, e.g. 9999999; the diagonal is never an edge
+    dense: boolean
+        for EXPLICIT instances, whether to keep the dense distance matrix next to the CSR adjacency
+    as_dict: boolean
+        return the dictionary of dictionaries format of generate_graph() instead
+
+    Output:
+    graph: ArrayGraph, GeometricGraph or dict
+        an EXPLICIT instance gives an ArrayGraph and an EUC_2D instance a GeometricGraph with rounded distances;
+        nodes are labelled 1..n, or by the node numbers of a NODE_COORD_SECTION
+    """
+    with open(path) as f:
+        specification, sections = _parse_tsplib(f.read())
+    if 'DIMENSION' not in specification:
+        raise ValueError('{!r} has no DIMENSION'.format(path))
+    num_nodes = int(specification['DIMENSION'])
+    weight_type = specification.get('EDGE_WEIGHT_TYPE', '').upper()
+    if weight_type == 'EUC_2D':
+        values = _numbers(sections.get('NODE_COORD_SECTION', ''))
+        if len(values) != 3 * num_nodes:
+            raise ValueError('NODE_COORD_SECTION does not hold {} nodes with 2 coordinates'.format(num_nodes))
+        values = values.reshape(num_nodes, 3)
+        graph = GeometricGraph(values[:, 1:], values[:, 0].astype(np.int64), rounded=True)
+    elif weight_type == 'EXPLICIT':
+        weight_format = specification.get('EDGE_WEIGHT_FORMAT', 'FULL_MATRIX').upper()
+        matrix = _explicit_matrix(_numbers(sections.get('EDGE_WEIGHT_SECTION', '')), num_nodes, weight_format)
+        if missing is not None:
+            matrix[matrix == missing] = NO_EDGE
+        np.fill_diagonal(matrix, NO_EDGE)
+        graph = ArrayGraph.from_matrix(matrix, dense=dense)
+    else:
+        raise ValueError('unsupported EDGE_WEIGHT_TYPE {!r}'.format(weight_type))
+    return graph.to_dict() if as_dict else graph
+
+def _number_format(values):
+    return '%d' if np.all(values == np.round(values)) else '%.17g'
+
+def write_tsplib(path, node_graph, name = None, comment = None, missing = None, block_size = 1024):
+    """
+    Write a graph as a TSPLIB file.
+
+    A GeometricGraph is written as EUC_2D coordinates, which TSPLIB readers take to have rounded
+    distances. An ArrayGraph is written as an EXPLICIT FULL_MATRIX, of TYPE TSP when it is symmetric
+    and ATSP otherwise; its node labels and self-loops are not kept, as a TSPLIB diagonal holds no edges.
+
+    Input:
+    path: string
+        output file
+    node_graph: dict, ArrayGraph or GeometricGraph
+        graph to write
+    name: string or None
+        NAME of the instance; defaults to the file name
+    comment: string or None
+        COMMENT of the instance
+    missing: int, float or None
+        weight written for missing edges; a graph with missing edges needs one, as TSPLIB has none
+    block_size: int
+        number of matrix rows computed at once
+    """
+    if isinstance(node_graph, dict):
+        node_graph = ArrayGraph.from_dict(node_graph)
+    if name is None:
+        name = os.path.splitext(os.path.basename(path))[0]
+    num_nodes = node_graph.num_nodes
+    with open(path, 'w') as f:
+        if isinstance(node_graph, GeometricGraph):
+            labels = node_graph.labels
+            if not np.issubdtype(labels.dtype, np.integer):
+                labels = np.arange(1, num_nodes + 1)
+            f.write('NAME : {}\nTYPE : TSP\n'.format(name))
+            if comment is not None:
+                f.write('COMMENT : {}\n'.format(comment))
+            f.write('DIMENSION : {}\nEDGE_WEIGHT_TYPE : EUC_2D\nNODE_COORD_SECTION\n'.format(num_nodes))
+            number_format = _number_format(node_graph.coordinates)
+            np.savetxt(f, np.column_stack((labels, node_graph.coordinates)), fmt=['%d', number_format, number_format])
+        else:
+            rows = np.repeat(np.arange(num_nodes), np.diff(node_graph.indptr))
+            proper = rows != node_graph.indices
+            if missing is None and np.count_nonzero(proper) < num_nodes * (num_nodes - 1):
+                raise ValueError('the graph has missing edges; give a weight to write for them')
+            reverse = node_graph.distance(node_graph.indices, rows)
+            symmetric = np.count_nonzero(proper) == num_nodes * (num_nodes - 1) and \
+                np.array_equal(reverse[proper], node_graph.weights[proper])
+            f.write('NAME : {}\nTYPE : {}\n'.format(name, 'TSP' if symmetric else 'ATSP'))
+            if comment is not None:
+                f.write('COMMENT : {}\n'.format(comment))
+            f.write('DIMENSION : {}\nEDGE_WEIGHT_TYPE : EXPLICIT\nEDGE_WEIGHT_FORMAT : FULL_MATRIX\n'
+                    'EDGE_WEIGHT_SECTION\n'.format(num_nodes))
+            weights = node_graph.weights if missing is None else np.append(node_graph.weights, missing)
+            number_format = _number_format(weights)
+            for first in range(0, num_nodes, block_size):
+                block_rows = np.arange(first, min(first + block_size, num_nodes))
+                block = node_graph.distance_rows(block_rows).copy()
+                if missing is not None:
+                    block[np.isnan(block)] = missing
+                block[np.arange(len(block_rows)), block_rows] = 0
+                np.savetxt(f, block, fmt=number_format)
+        f.write('EOF\n')
+
+class _Mapped:
+    """
+    Graph whose arrays are mapped from a directory written by save_graph(). It is pickled as its
+    directory, so worker processes map the files instead of receiving copies of the arrays.
+    """
+
+    def __reduce__(self):
+        return (load_graph, (self.path,))
+
+class _MappedArrayGraph(_Mapped, ArrayGraph):
+    pass
+
+class _MappedGeometricGraph(_Mapped, GeometricGraph):
+    pass
+
+def save_graph(node_graph, directory):
+    """
+    Write a graph in the native format: a directory of .npy arrays and a graph.json description.
+
+    Input:
+    node_graph: dict, ArrayGraph or GeometricGraph
+        graph to write; the dense matrix of an ArrayGraph is written when it has one
+    directory: string
+        output directory, created when missing
+    """
+    if isinstance(node_graph, dict):
+        node_graph = ArrayGraph.from_dict(node_graph)
+    os.makedirs(directory, exist_ok=True)
+    if isinstance(node_graph, GeometricGraph):
+        arrays = {'coordinates': node_graph.coordinates}
+        description = {'kind': 'geometric', 'rounded': bool(node_graph.rounded)}
+    else:
+        arrays = {'indptr': node_graph.indptr, 'indices': node_graph.indices, 'weights': node_graph.weights}
+        if node_graph.matrix is not None:
+            arrays['matrix'] = np.asarray(node_graph.matrix, dtype=np.float64)
+        description = {'kind': 'array'}
+    arrays['labels'] = node_graph.labels
+    description['arrays'] = sorted(arrays)
+    description['num_nodes'] = int(node_graph.num_nodes)
+    # Labels of mixed types can only be stored as pickled objects, which can not be mapped.
+    description['object_labels'] = bool(node_graph.labels.dtype == object)
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, name + '.npy'), array, allow_pickle=description['object_labels'])
+    with open(os.path.join(directory, 'graph.json'), 'w') as f:
+        json.dump(description, f)
+
+def load_graph(directory, mmap = True, as_dict = False):
+    """
+    Load a graph written by save_graph().
+
+    Input:
+    directory: string
+        directory written by save_graph()
+    mmap: boolean
+        map the arrays read-only with np.memmap instead of reading them into memory
+    as_dict: boolean
+        return the dictionary of dictionaries format of generate_graph() instead
+
+    Output:
+    graph: ArrayGraph, GeometricGraph or dict
+    """
+    with open(os.path.join(directory, 'graph.json')) as f:
+        description = json.load(f)
+    mmap_mode = 'r' if mmap else None
+    arrays = {}
+    for name in description['arrays']:
+        path = os.path.join(directory, name + '.npy')
+        if name == 'labels':
+            arrays[name] = np.load(path, allow_pickle=description['object_labels'])
+        else:
+            arrays[name] = np.load(path, mmap_mode=mmap_mode)
+    if description['kind'] == 'geometric':
+        graph_class = _MappedGeometricGraph if mmap else GeometricGraph
+        graph = graph_class(arrays['coordinates'], arrays['labels'], description['rounded'])
+    else:
+        graph_class = _MappedArrayGraph if mmap else ArrayGraph
+        graph = graph_class(arrays['indptr'], arrays['indices'], arrays['weights'], arrays['labels'],
+                            arrays.get('matrix'))
+    if as_dict:
+        return graph.to_dict()
+    if mmap:
+        graph.path = os.path.abspath(directory)
+    return graph
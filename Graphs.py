@@ -7,7 +7,25 @@ be used for a travelling salesman problem.
 
 import numpy as np
 
-def generate_graph(num_nodes, max_distance = 15, symmetric = True):
+def make_rng(rng = None):
+    """
+    Return a NumPy random Generator.
+
+    Input:
+    rng: None, int, SeedSequence or Generator
+        None draws a seed from the global np.random state, so np.random.seed() keeps runs reproducible;
+        an int or SeedSequence seeds a new Generator; a Generator is returned as it is
+
+    Output:
+    rng: np.random.Generator
+    """
+    if isinstance(rng, np.random.Generator):
+        return rng
+    if rng is None:
+        rng = np.random.randint(0, 2**31 - 1)
+    return np.random.default_rng(rng)
+
+def generate_graph(num_nodes, max_distance = 15, symmetric = True, rng = None, compact = False):
     """
     Function to generate a graph to be used for a travelling salesman problem.
 
@@ -18,12 +36,20 @@ def generate_graph(num_nodes, max_distance = 15, symmetric = True):
         largest distance possible between nodes
     symmetric: boolean
         whether distance between two of nodes is same in both directions 
+    rng: None, int, SeedSequence or Generator
+        when given, the graph is built with vectorized generate_graphs() on this random generator
+    compact: boolean
+        return an ArrayGraph built by generate_graphs() instead of a dictionary
 
     Output:
     graph: dictionary of dictionaries
         outer keys represent starting nodes; outer values are dictionaries of destination nodes and distances
         inner keys are destination nodes; inner values are distances
+        an ArrayGraph when compact is True
     """
+    if compact or rng is not None:
+        graph = generate_graphs(1, num_nodes, max_distance, symmetric, rng)[0]
+        return graph if compact else graph.to_dict()
     graph = {}
     # Initialize the graph.
     for i in np.arange(1, num_nodes + 1):
@@ -50,8 +76,509 @@ def generate_graph(num_nodes, max_distance = 15, symmetric = True):
     return graph
 
 
+# Sentinel stored in a dense distance matrix where there is no edge between two nodes.
+NO_EDGE = np.nan
+
+class _LabelledGraph:
+    """
+    Node label handling shared by the array graph types. Subclasses set `labels` and implement distance().
+    """
+
+    _label_index = None
+
+    def index_of(self, label):
+        """
+        Return the node index of a node label.
+        """
+        if self._label_index is None:
+            self._label_index = {label: i for i, label in enumerate(self.labels.tolist())}
+        return self._label_index[label]
+
+    def path_labels(self, path):
+        """
+        Translate a path of node indices into a list of node labels.
+        """
+        return self.labels[np.asarray(path, dtype=np.int64)].tolist()
+
+    def path_indices(self, path):
+        """
+        Translate a path of node labels into a list of node indices.
+        """
+        return [self.index_of(label) for label in path]
+
+    def path_distance(self, path):
+        """
+        Return the total distance of a path of node indices; NaN if it uses a missing edge.
+        """
+        path = np.asarray(path, dtype=np.int64)
+        return np.sum(self.distance(path[:-1], path[1:]))
+
+
+class ArrayGraph(_LabelledGraph):
+    """
+    Array-backed graph to be used for a travelling salesman problem.
+
+    Nodes are stored as indices 0..n-1 and the original node labels (1..n for
+    graphs from generate_graph()) are kept in `labels`. Edges are always held as
+    a CSR adjacency with sorted rows; dense graphs additionally keep an n x n
+    distance matrix where missing edges hold NO_EDGE.
+
+    Attributes:
+    indptr: array of int
+        row pointers of the CSR adjacency; neighbours of node i are indices[indptr[i]:indptr[i + 1]]
+    indices: array of int
+        destination node of every edge, sorted within each row
+    weights: array of float
+        distance of every edge
+    labels: array
+        node label of every node index
+    matrix: array of float or None
+        dense distance matrix with NO_EDGE for missing edges; None for a sparse graph
+    """
+
+    def __init__(self, indptr, indices, weights, labels = None, matrix = None):
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.weights = np.asarray(weights, dtype=np.float64)
+        num_nodes = len(self.indptr) - 1
+        if labels is None:
+            labels = np.arange(1, num_nodes + 1)
+        self.labels = np.asarray(labels)
+        self.matrix = matrix
+        self._edge_keys = None
+
+    @classmethod
+    def from_csr(cls, indptr, indices, weights, labels = None, dense = False):
+        """
+        Build a graph from a CSR adjacency. Rows do not have to be sorted.
+
+        Input:
+        indptr, indices, weights: array-like
+            CSR adjacency of the graph
+        labels: array-like or None
+            node labels; defaults to 1..n
+        dense: boolean
+            whether to also build a dense distance matrix
+        """
+        indptr = np.asarray(indptr, dtype=np.int64)
+        indices = np.asarray(indices, dtype=np.int64)
+        weights = np.asarray(weights, dtype=np.float64)
+        rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+        order = np.lexsort((indices, rows))
+        graph = cls(indptr, indices[order], weights[order], labels)
+        if dense:
+            graph.matrix = graph.to_matrix()
+        return graph
+
+    @classmethod
+    def from_matrix(cls, matrix, labels = None, missing = NO_EDGE, dense = True):
+        """
+        Build a graph from a square distance matrix.
+
+        Input:
+        matrix: 2D array-like
+            distances between nodes; entries equal to `missing` are treated as missing edges
+        labels: array-like or None
+            node labels; defaults to 1..n
+        missing: int or float
+            value that marks a missing edge in `matrix`
+        dense: boolean
+            whether to keep the dense distance matrix next to the CSR adjacency
+        """
+        matrix = np.array(matrix, dtype=np.float64)
+        if np.isnan(missing):
+            mask = ~np.isnan(matrix)
+        else:
+            mask = matrix != missing
+            matrix[~mask] = NO_EDGE
+        rows, cols = np.nonzero(mask)
+        indptr = np.zeros(matrix.shape[0] + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=matrix.shape[0]), out=indptr[1:])
+        return cls(indptr, cols, matrix[rows, cols], labels, matrix if dense else None)
+
+    @classmethod
+    def from_dict(cls, graph, dense = None):
+        """
+        Build a graph from the dictionary of dictionaries returned by generate_graph().
+
+        Input:
+        graph: dictionary of dictionaries
+            outer keys are starting nodes; inner keys are destination nodes and inner values are distances
+        dense: boolean or None
+            whether to keep a dense distance matrix; None picks it by edge density
+
+        Output:
+        graph: ArrayGraph
+        """
+        labels = list(graph.keys())
+        label_index = {label: i for i, label in enumerate(labels)}
+        for destinations in graph.values():
+            for destination in destinations:
+                if destination not in label_index:
+                    label_index[destination] = len(labels)
+                    labels.append(destination)
+        num_nodes = len(labels)
+        rows = []
+        cols = []
+        weights = []
+        for node, destinations in graph.items():
+            i = label_index[node]
+            for destination, distance in destinations.items():
+                rows.append(i)
+                cols.append(label_index[destination])
+                weights.append(distance)
+        rows = np.array(rows, dtype=np.int64)
+        indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=num_nodes), out=indptr[1:])
+        order = np.argsort(rows, kind='stable')
+        if dense is None:
+            dense = len(rows) * 8 >= num_nodes * num_nodes
+        return cls.from_csr(indptr, np.array(cols, dtype=np.int64)[order], np.array(weights, dtype=np.float64)[order],
+                            np.array(labels), dense)
+
+    @property
+    def num_nodes(self):
+        return len(self.indptr) - 1
+
+    @property
+    def num_edges(self):
+        return len(self.indices)
+
+    @property
+    def is_dense(self):
+        return self.matrix is not None
+
+    def neighbours(self, node):
+        """
+        Return the destination node indices of a node as a read-only view.
+        """
+        return self.indices[self.indptr[node]:self.indptr[node + 1]]
+
+    def neighbour_weights(self, node):
+        """
+        Return the distances to the destinations of a node, aligned with neighbours(node).
+        """
+        return self.weights[self.indptr[node]:self.indptr[node + 1]]
+
+    def degree(self, node = None):
+        """
+        Return the out-degree of a node, or of all nodes when node is None.
+        """
+        if node is None:
+            return np.diff(self.indptr)
+        return self.indptr[node + 1] - self.indptr[node]
+
+    def _edge_position(self, start, end):
+        # Rows are sorted, so row * n + column is a globally sorted key of every edge.
+        if self._edge_keys is None:
+            rows = np.repeat(np.arange(self.num_nodes, dtype=np.int64), np.diff(self.indptr))
+            self._edge_keys = rows * self.num_nodes + self.indices
+        keys = np.asarray(start, dtype=np.int64) * self.num_nodes + np.asarray(end, dtype=np.int64)
+        position = np.minimum(np.searchsorted(self._edge_keys, keys), max(self.num_edges - 1, 0))
+        found = self._edge_keys[position] == keys if self.num_edges > 0 else np.zeros(np.shape(keys), dtype=bool)
+        return position, found
+
+    def has_edge(self, start, end):
+        """
+        Check whether there is an edge from start to end. Works element-wise on arrays.
+        """
+        if self.matrix is not None:
+            return ~np.isnan(self.matrix[start, end])
+        return self._edge_position(start, end)[1]
+
+    def distance(self, start, end):
+        """
+        Return the distance from start to end, or NO_EDGE when there is no edge. Works element-wise on arrays.
+        """
+        if self.matrix is not None:
+            return self.matrix[start, end]
+        position, found = self._edge_position(start, end)
+        if self.num_edges == 0:
+            return np.where(found, 0.0, NO_EDGE)[()]
+        return np.where(found, self.weights[position], NO_EDGE)[()]
+
+    def distance_rows(self, rows):
+        """
+        Return the distances from the given nodes to all nodes as a len(rows) x n block with NO_EDGE for missing edges.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        if self.matrix is not None:
+            return self.matrix[rows]
+        block = np.full((len(rows), self.num_nodes), NO_EDGE)
+        for k, row in enumerate(rows):
+            block[k, self.neighbours(row)] = self.neighbour_weights(row)
+        return block
+
+    def to_matrix(self):
+        """
+        Return the dense distance matrix with NO_EDGE for missing edges.
+        """
+        if self.matrix is not None:
+            return self.matrix
+        matrix = np.full((self.num_nodes, self.num_nodes), NO_EDGE)
+        rows = np.repeat(np.arange(self.num_nodes), np.diff(self.indptr))
+        matrix[rows, self.indices] = self.weights
+        return matrix
+
+    def to_dense(self):
+        """
+        Return a copy of the graph that keeps a dense distance matrix.
+        """
+        return ArrayGraph(self.indptr, self.indices, self.weights, self.labels, self.to_matrix())
+
+    def to_sparse(self):
+        """
+        Return a copy of the graph that only keeps the CSR adjacency.
+        """
+        return ArrayGraph(self.indptr, self.indices, self.weights, self.labels)
+
+    def to_dict(self):
+        """
+        Convert the graph into the dictionary of dictionaries format of generate_graph().
+        """
+        labels = self.labels.tolist()
+        indices = self.indices.tolist()
+        weights = self.weights.tolist()
+        graph = {}
+        for i, label in enumerate(labels):
+            graph[label] = {labels[indices[k]]: weights[k] for k in range(self.indptr[i], self.indptr[i + 1])}
+        return graph
+
+
+def as_array_graph(graph):
+    """
+    Return the graph as an ArrayGraph, converting it when it is a dictionary from generate_graph().
+
+    Input:
+    graph: dictionary of dictionaries or ArrayGraph
+
+    Output:
+    graph: ArrayGraph
+    """
+    if isinstance(graph, dict):
+        return ArrayGraph.from_dict(graph)
+    return graph
+
+
+def generate_graphs(num_graphs, num_nodes, max_distance = 15, symmetric = True, rng = None, dense = True):
+    """
+    Function to generate a batch of graphs with NumPy array operations.
+
+    The graphs follow the same construction as generate_graph(): every node gets a random number of
+    routes to random destinations, and a later route between two nodes overwrites an earlier one.
+    All random numbers of the batch are drawn at once from a single random generator, so the
+    same seed always gives the same batch.
+
+    Input:
+    num_graphs: int
+        number of graphs to generate
+    num_nodes: int
+        number of nodes in every graph
+    max_distance: int
+        largest distance possible between nodes
+    symmetric: boolean
+        whether distance between two of nodes is same in both directions
+    rng: None, int, SeedSequence or Generator
+        random generator or seed, see make_rng()
+    dense: boolean
+        whether the graphs keep a dense distance matrix next to the CSR adjacency
+
+    Output:
+    graphs: list of ArrayGraph
+    """
+    rng = make_rng(rng)
+    size = num_nodes * num_nodes
+    # Number of routes of every node, then the source, destination and distances of every route.
+    num_routes = rng.integers(1, num_nodes - 1, size=num_graphs * num_nodes)
+    sources = np.repeat(np.arange(num_graphs * num_nodes, dtype=np.int64), num_routes)
+    graph_ids = sources // num_nodes
+    sources = sources % num_nodes
+    # Destinations are drawn from nodes 1..num_nodes - 1 as in generate_graph().
+    destinations = rng.integers(0, num_nodes - 1, size=len(sources))
+    distances = rng.integers(1, max_distance, size=len(sources)).astype(np.float64)
+    if symmetric:
+        reverse_distances = distances
+    else:
+        reverse_distances = rng.integers(1, max_distance, size=len(sources)).astype(np.float64)
+    # Every route writes the forward edge and then the reverse edge.
+    offsets = graph_ids * size
+    keys = np.empty(2 * len(sources), dtype=np.int64)
+    keys[0::2] = offsets + sources * num_nodes + destinations
+    keys[1::2] = offsets + destinations * num_nodes + sources
+    values = np.empty(2 * len(sources))
+    values[0::2] = distances
+    values[1::2] = reverse_distances
+    # Keep the last write of every edge; unique keys come out sorted by graph, row and column.
+    keys, last = np.unique(keys[::-1], return_index=True)
+    values = values[::-1][last]
+    bounds = np.searchsorted(keys, np.arange(num_graphs + 1, dtype=np.int64) * size)
+    graphs = []
+    for g in range(num_graphs):
+        edge_keys = keys[bounds[g]:bounds[g + 1]] - g * size
+        rows = edge_keys // num_nodes
+        indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=num_nodes), out=indptr[1:])
+        graph = ArrayGraph(indptr, edge_keys % num_nodes, values[bounds[g]:bounds[g + 1]])
+        if dense:
+            graph.matrix = graph.to_matrix()
+        graphs.append(graph)
+    return graphs
+
+
+class GeometricGraph(_LabelledGraph):
+    """
+    Complete graph over points in the plane to be used for a travelling salesman problem.
+
+    Only the node coordinates are stored. Distances are computed on demand, or in blocks of rows
+    by distance_rows(), so large instances never hold an n x n matrix. It offers the same methods
+    as ArrayGraph, so the solvers can use both in the same way.
+
+    Attributes:
+    coordinates: 2D array of float
+        x and y coordinate of every node index
+    labels: array
+        node label of every node index
+    rounded: boolean
+        whether distances are rounded to the nearest integer as in TSPLIB EUC_2D
+    """
+
+    matrix = None
+
+    def __init__(self, coordinates, labels = None, rounded = False):
+        self.coordinates = np.asarray(coordinates, dtype=np.float64)
+        if labels is None:
+            labels = np.arange(1, len(self.coordinates) + 1)
+        self.labels = np.asarray(labels)
+        self.rounded = rounded
+
+    @property
+    def num_nodes(self):
+        return len(self.coordinates)
+
+    @property
+    def num_edges(self):
+        return self.num_nodes * (self.num_nodes - 1)
+
+    @property
+    def is_dense(self):
+        return False
+
+    def neighbours(self, node):
+        """
+        Return the destination node indices of a node, which are all other nodes.
+        """
+        return np.delete(np.arange(self.num_nodes), node)
+
+    def neighbour_weights(self, node):
+        """
+        Return the distances to the destinations of a node, aligned with neighbours(node).
+        """
+        return np.delete(self.distance_rows([node])[0], node)
+
+    def degree(self, node = None):
+        """
+        Return the out-degree of a node, or of all nodes when node is None.
+        """
+        if node is None:
+            return np.full(self.num_nodes, self.num_nodes - 1)
+        return self.num_nodes - 1
+
+    def has_edge(self, start, end):
+        """
+        Check whether there is an edge from start to end. Works element-wise on arrays.
+        """
+        return np.asarray(start) != np.asarray(end)
+
+    def _round(self, dist):
+        if self.rounded:
+            return np.floor(dist + 0.5)
+        return dist
+
+    def distance(self, start, end):
+        """
+        Return the distance from start to end, or NO_EDGE when start is end. Works element-wise on arrays.
+        """
+        difference = self.coordinates[start] - self.coordinates[end]
+        dist = self._round(np.sqrt(np.sum(difference * difference, axis=-1)))
+        return np.where(np.asarray(start) == np.asarray(end), NO_EDGE, dist)[()]
 
+    def distance_rows(self, rows):
+        """
+        Return the distances from the given nodes to all nodes as a len(rows) x n block.
 
-    
+        Input:
+        rows: array-like of int
+            node indices of the block rows
 
+        Output:
+        block: 2D array of float
+            distances with NO_EDGE where a row meets its own node
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        difference = self.coordinates[rows, None, :] - self.coordinates[None, :, :]
+        block = self._round(np.sqrt(np.einsum('ijk,ijk->ij', difference, difference)))
+        block[np.arange(len(rows)), rows] = NO_EDGE
+        return block
 
+    def to_matrix(self, block_size = 1024):
+        """
+        Return the dense distance matrix with NO_EDGE on the diagonal, computed block by block.
+        """
+        matrix = np.empty((self.num_nodes, self.num_nodes))
+        for first in range(0, self.num_nodes, block_size):
+            rows = np.arange(first, min(first + block_size, self.num_nodes))
+            matrix[rows] = self.distance_rows(rows)
+        return matrix
+
+    def to_dense(self):
+        """
+        Return the graph as an ArrayGraph with a dense distance matrix.
+        """
+        return ArrayGraph.from_matrix(self.to_matrix(), self.labels)
+
+    def to_dict(self):
+        """
+        Convert the graph into the dictionary of dictionaries format of generate_graph().
+        """
+        return self.to_dense().to_dict()
+
+
+def generate_geometric_graph(num_nodes, layout = 'uniform', scale = 100, num_clusters = 5, spread = 0.05,
+                             rng = None, rounded = False):
+    """
+    Function to generate a complete graph over random points in the plane.
+
+    Input:
+    num_nodes: int
+        number of nodes in a graph
+    layout: string
+        'uniform' for points spread over the square, 'clustered' for points around random centres,
+        or 'grid' for points on a regular grid
+    scale: int or float
+        side length of the square holding the points
+    num_clusters: int
+        number of cluster centres for the 'clustered' layout
+    spread: float
+        standard deviation of points around their centre for the 'clustered' layout, as a share of scale
+    rng: None, int, SeedSequence or Generator
+        random generator or seed, see make_rng()
+    rounded: boolean
+        whether distances are rounded to the nearest integer as in TSPLIB EUC_2D
+
+    Output:
+    graph: GeometricGraph
+    """
+    rng = make_rng(rng)
+    if layout == 'uniform':
+        coordinates = rng.uniform(0, scale, size=(num_nodes, 2))
+    elif layout == 'clustered':
+        centres = rng.uniform(0, scale, size=(num_clusters, 2))
+        membership = rng.integers(0, num_clusters, size=num_nodes)
+        coordinates = centres[membership] + rng.normal(0, spread * scale, size=(num_nodes, 2))
+    elif layout == 'grid':
+        side = int(np.ceil(np.sqrt(num_nodes)))
+        position = np.arange(num_nodes)
+        coordinates = np.column_stack((position % side, position // side)) * (scale / side)
+    else:
+        raise ValueError("layout must be 'uniform', 'clustered' or 'grid'")
+    return GeometricGraph(coordinates, rounded=rounded)
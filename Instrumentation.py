@@ -0,0 +1,66 @@
+"""
+INSTRUMENTATION
+
+This code implements the statistics a solver collects when it is called
+with stats=True: counters of tours, dead ends and moves, time spent per
+phase and the trajectory of the best distance.
+
+Solvers only touch a SolverStats object when one was asked for, so runs
+without statistics do no extra work in their loops.
+"""
+
+import time
+from collections import defaultdict
+
+class SolverStats:
+    """
+    Counters, phase timers and improvement trajectory of one solver run.
+
+    counters: dict of string to int
+        e.g. tours_constructed, dead_ends, moves_proposed, moves_accepted, moves_rejected
+    timers: dict of string to float
+        seconds spent in every phase
+    trajectory: list of (iteration, seconds, best_dist)
+        every improvement of the best path, with the iteration and time since the start of the run
+    """
+
+    def __init__(self):
+        self.counters = defaultdict(int)
+        self.timers = defaultdict(float)
+        self.trajectory = []
+        self.start = time.perf_counter()
+
+    def count(self, name, number = 1):
+        """
+        Add number to a counter.
+        """
+        self.counters[name] += number
+
+    def add_time(self, name, seconds):
+        """
+        Add seconds to the timer of a phase.
+        """
+        self.timers[name] += seconds
+
+    def improved(self, iteration, best_dist):
+        """
+        Record a new best distance found at an iteration.
+        """
+        self.trajectory.append((iteration, time.perf_counter() - self.start, best_dist))
+
+    def finish(self):
+        """
+        Record the total run time as the timer 'total'.
+        """
+        self.timers['total'] = time.perf_counter() - self.start
+
+    def as_dict(self):
+        """
+        Return the statistics as plain dictionaries and lists, e.g. to be written as JSON.
+        """
+        return {'counters': dict(self.counters), 'timers': dict(self.timers),
+                'trajectory': [(iteration, seconds, float(best_dist)) for iteration, seconds, best_dist in self.trajectory]}
+
+    def __repr__(self):
+        return 'SolverStats(counters={}, timers={}, improvements={})'.format(dict(self.counters), dict(self.timers),
+                                                                          len(self.trajectory))
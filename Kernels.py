@@ -0,0 +1,146 @@
+"""
+COMPILED KERNELS
+
+This code implements the random walk that builds paths for all the solvers,
+including the crossover walk of the genetic algorithm, as a loop over the
+CSR arrays of an ArrayGraph. It is compiled with Numba when Numba can be
+imported; otherwise the solvers use their NumPy implementation.
+
+Both implementations read their random numbers from the same block drawn
+before every walk, so they give identical paths for identical seeds.
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# 'compiled' runs the kernels of this module, 'python' the NumPy code of the solvers.
+BACKEND = 'python' if njit is None else 'compiled'
+
+def set_backend(backend):
+    """
+    Select the implementation used by the solvers.
+
+    Input:
+    backend: string
+        'compiled' uses the kernels of this module, which run as plain Python when Numba is missing;
+        'python' uses the NumPy implementation of the solvers
+    """
+    global BACKEND
+    if backend not in ('compiled', 'python'):
+        raise ValueError("backend must be 'compiled' or 'python'")
+    BACKEND = backend
+
+def _jit(function):
+    """
+    Compile a kernel with Numba when it is available.
+    """
+    if njit is None:
+        return function
+    return njit(cache=True)(function)
+
+@_jit
+def _pick_allowed(indices, lo, hi, visited, last_step, end_node, successor1, successor2, non_parent, uniform):
+    """
+    Return the CSR position of the allowed destination picked by uniform, or -1 when none is allowed.
+    With non_parent only destinations that are neither successor1 nor successor2 count.
+    """
+    count = 0
+    for c in range(lo, hi):
+        node = indices[c]
+        if (not visited[node] or (last_step and node == end_node)) and \
+                (not non_parent or (node != successor1 and node != successor2)):
+            count += 1
+    if count == 0:
+        return -1
+    r = min(int(uniform*count), count - 1)
+    for c in range(lo, hi):
+        node = indices[c]
+        if (not visited[node] or (last_step and node == end_node)) and \
+                (not non_parent or (node != successor1 and node != successor2)):
+            if r == 0:
+                return c
+            r -= 1
+    return -1
+
+@_jit
+def walk(indptr, indices, weights, start_node, end_node, num_steps, draws, successors1, successors2, mutation_rate):
+    """
+    Build one path by a random walk that never revisits a node.
+
+    Input:
+    indptr, indices, weights: arrays
+        CSR adjacency of an ArrayGraph
+    start_node, end_node: int
+        node indices
+    num_steps: int
+        number of steps of the path
+    draws: 2D array of float
+        uniform random numbers, one row per step; a row holds the random probes and a last number
+        for the fallback pick, or the mutation and parent numbers of a crossover walk
+    successors1, successors2: arrays of int
+        successor of every node in the parents of a crossover walk; empty arrays for a random walk
+    mutation_rate: float
+        probability of taking a destination of neither parent
+
+    Output:
+    path: array of int
+        node indices of the path
+    dist: float
+        distance of the path
+    found: boolean
+        False when the walk hit a dead end
+    """
+    num_probes = draws.shape[1] - 1
+    crossover = len(successors1) > 0
+    visited = np.zeros(len(indptr) - 1, dtype=np.bool_)
+    visited[start_node] = True
+    path = np.empty(num_steps + 1, dtype=np.int64)
+    path[0] = start_node
+    dist = 0.0
+    current_node = start_node
+    for j in range(num_steps):
+        lo = indptr[current_node]
+        hi = indptr[current_node + 1]
+        degree = hi - lo
+        last_step = j == num_steps - 1
+        position = -1
+        if not crossover:
+            if degree > 0:
+                for k in range(num_probes):
+                    c = lo + min(int(draws[j, k]*degree), degree - 1)
+                    if not visited[indices[c]] or (last_step and indices[c] == end_node):
+                        position = c
+                        break
+            if position < 0:
+                position = _pick_allowed(indices, lo, hi, visited, last_step, end_node, -1, -1, False,
+                                         draws[j, num_probes])
+        else:
+            successor1 = successors1[current_node]
+            successor2 = successors2[current_node]
+            any_non_parent = False
+            for c in range(lo, hi):
+                if indices[c] != successor1 and indices[c] != successor2:
+                    any_non_parent = True
+                    break
+            if draws[j, 0] < mutation_rate and any_non_parent:
+                position = _pick_allowed(indices, lo, hi, visited, last_step, end_node, successor1, successor2,
+                                         True, draws[j, 1])
+            else:
+                destination = successor1 if draws[j, 1] < 0.5 else successor2
+                for c in range(lo, hi):
+                    if indices[c] == destination and (not visited[destination] or
+                                                      (last_step and destination == end_node)):
+                        position = c
+                        break
+        if position < 0:
+            return path, dist, False
+        destination = indices[position]
+        visited[destination] = True
+        path[j + 1] = destination
+        dist += weights[position]
+        current_node = destination
+    return path, dist, True
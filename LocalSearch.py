@@ -0,0 +1,444 @@
+"""
+LOCAL SEARCH
+
+This code implements 2-opt and Or-opt moves with constant time delta
+evaluation, to be used as a neighbourhood by the metaheuristic algorithms.
+
+A 2-opt move reverses the segment between two positions of a path;
+an Or-opt move takes a segment of up to three nodes out of a path and
+inserts it between two other consecutive nodes. The first and last node
+of a path never move.
+"""
+
+import time
+import numpy as np
+import weakref
+from collections import deque
+
+# Segment lengths tried by Or-opt moves.
+OR_OPT_LENGTHS = (1, 2, 3)
+
+# Move types used by each neighbourhood name.
+NEIGHBOURHOODS = {'2-opt': ('2-opt',), 'or-opt': ('or-opt',), 'both': ('2-opt', 'or-opt')}
+
+# Smallest gain that counts as an improvement, so rounding errors do not make moves cycle.
+_MIN_GAIN = 1e-9
+
+# Largest number of distances computed at once when candidate lists are built.
+_BLOCK_ELEMENTS = 2**22
+
+# Candidate lists of every graph, keyed by graph object and then by (num_candidates, goal).
+_CANDIDATE_CACHE = weakref.WeakKeyDictionary()
+
+def _rank_rows(block, rows, num_candidates, goal):
+    """
+    Return the num_candidates best destinations of every row of a distance block, best first, padded with -1.
+    Row r of the block holds the distances from node rows[r], which is never its own candidate.
+    """
+    if goal == 'max':
+        keys = -block
+    else:
+        keys = block.copy()
+    keys[np.isnan(keys)] = np.inf
+    keys[np.arange(len(rows)), rows] = np.inf
+    k = min(num_candidates, block.shape[1] - 1)
+    nearest = np.full((len(rows), num_candidates), -1, dtype=np.int64)
+    if k <= 0:
+        return nearest
+    part = np.argpartition(keys, k - 1, axis=1)[:, :k]
+    part_keys = np.take_along_axis(keys, part, axis=1)
+    order = np.argsort(part_keys, axis=1, kind='stable')
+    part = np.take_along_axis(part, order, axis=1)
+    part[np.take_along_axis(part_keys, order, axis=1) == np.inf] = -1
+    nearest[:, :k] = part
+    return nearest
+
+def _build_candidates(node_graph, num_candidates, goal):
+    num_nodes = node_graph.num_nodes
+    candidates = np.full((num_nodes, num_candidates), -1, dtype=np.int64)
+    if getattr(node_graph, 'indptr', None) is not None and node_graph.matrix is None:
+        # Sparse graphs are ranked row by row over their edges only.
+        for node in range(num_nodes):
+            destinations = node_graph.neighbours(node)
+            # A column for the node itself keeps self-loops out of the candidates.
+            weights = np.append(np.where(destinations == node, np.nan, node_graph.neighbour_weights(node)), np.nan)
+            ranked = _rank_rows(weights[None, :], np.array([len(destinations)]), num_candidates, goal)[0]
+            ranked = destinations[ranked[ranked >= 0]]
+            candidates[node, :len(ranked)] = ranked
+        return candidates
+    block_size = max(1, _BLOCK_ELEMENTS // max(num_nodes, 1))
+    for first in range(0, num_nodes, block_size):
+        rows = np.arange(first, min(first + block_size, num_nodes))
+        candidates[rows] = _rank_rows(node_graph.distance_rows(rows), rows, num_candidates, goal)
+    return candidates
+
+def candidate_lists(node_graph, num_candidates = 10, goal = 'min'):
+    """
+    Return the candidate list of every node: its nearest destinations for goal 'min' or its farthest
+    destinations for goal 'max', best first.
+
+    The lists are built once per graph object with argpartition over blocks of distance rows and
+    cached until clear_candidates() is called for the graph or the graph is garbage collected.
+    The cache only works when the same ArrayGraph or GeometricGraph is passed again: the solvers turn
+    a dictionary into a new ArrayGraph on every call, so convert it once with Graphs.as_array_graph()
+    to reuse the lists over repeated solves. Hashing the graph content would cost more than building them.
+
+    Input:
+    node_graph: ArrayGraph or GeometricGraph
+        input graph
+    num_candidates: int
+        number of candidates of every node
+    goal: string
+        'min' or 'max'
+
+    Output:
+    candidates: 2D array of int
+        num_nodes x num_candidates node indices; rows with fewer destinations are padded with -1
+    """
+    cache = _CANDIDATE_CACHE.setdefault(node_graph, {})
+    key = (num_candidates, goal)
+    if key not in cache:
+        cache[key] = _build_candidates(node_graph, num_candidates, goal)
+    return cache[key]
+
+def clear_candidates(node_graph = None):
+    """
+    Drop the cached candidate lists of a graph, e.g. after its distances changed, or of all graphs when node_graph is None.
+    """
+    if node_graph is None:
+        _CANDIDATE_CACHE.clear()
+    else:
+        _CANDIDATE_CACHE.pop(node_graph, None)
+
+def _gain(delta, goal):
+    """
+    Turn a change of distance into a gain that is positive for an improvement; NaN becomes -inf.
+    """
+    if goal == 'max':
+        gain = np.asarray(delta, dtype=np.float64)
+    else:
+        gain = -np.asarray(delta, dtype=np.float64)
+    return np.where(np.isnan(gain), -np.inf, gain)
+
+class Tour:
+    """
+    Path with prefix sums of its edges, so the change of distance of a move is computed in O(1).
+
+    The backward prefix sums hold the distances of every edge walked in the opposite direction,
+    which prices a reversed segment on asymmetric graphs, and the missing prefix counts edges
+    that do not exist in the opposite direction, which checks its feasibility on sparse graphs.
+
+    Attributes:
+    path: array of int
+        node indices of the path
+    dist: float
+        distance of the path
+    """
+
+    def __init__(self, path, node_graph):
+        self.path = np.array(path, dtype=np.int64)
+        self.node_graph = node_graph
+        self.refresh()
+
+    def refresh(self):
+        """
+        Recompute the prefix sums after the path changed.
+        """
+        path = self.path
+        forward = self.node_graph.distance(path[:-1], path[1:])
+        backward = self.node_graph.distance(path[1:], path[:-1])
+        missing = np.isnan(backward)
+        self.forward = np.concatenate(([0.0], np.cumsum(forward)))
+        self.backward = np.concatenate(([0.0], np.cumsum(np.where(missing, 0.0, backward))))
+        self.missing = np.concatenate(([0], np.cumsum(missing)))
+        self.dist = self.forward[-1]
+        # Position of every node; the first position wins for a closed path.
+        self.pos = np.full(self.node_graph.num_nodes, -1, dtype=np.int64)
+        self.pos[path[::-1]] = np.arange(len(path) - 1, -1, -1)
+
+    @property
+    def num_steps(self):
+        return len(self.path) - 1
+
+    def two_opt_delta(self, i, j):
+        """
+        Return the change of distance of reversing path[i..j], or NaN when it needs a missing edge.
+        Works element-wise when j is an array.
+
+        Input:
+        i: int
+            first position of the segment, 1 <= i
+        j: int or array of int
+            last position of the segment, i < j <= len(path) - 2
+        """
+        path = self.path
+        j = np.asarray(j)
+        a = path[i - 1]
+        b = path[i]
+        c = path[j]
+        d = path[j + 1]
+        old_dist = self.forward[j + 1] - self.forward[i - 1]
+        new_dist = (self.node_graph.distance(a, c) + self.node_graph.distance(b, d)
+                    + self.backward[j] - self.backward[i])
+        feasible = self.missing[j] == self.missing[i]
+        return np.where(feasible, new_dist - old_dist, np.nan)[()]
+
+    def two_opt_feasible(self, i, j):
+        """
+        Check whether reversing path[i..j] only uses existing edges, even when the path itself uses a missing edge.
+        """
+        path = self.path
+        return bool(self.node_graph.has_edge(path[i - 1], path[j]) and self.node_graph.has_edge(path[i], path[j + 1])
+                    and self.missing[j] == self.missing[i])
+
+    def apply_two_opt(self, i, j):
+        """
+        Reverse path[i..j].
+        """
+        self.path[i:j + 1] = self.path[i:j + 1][::-1]
+        self.refresh()
+
+    def or_opt_delta(self, i, length, j):
+        """
+        Return the change of distance of moving path[i..i + length - 1] between path[j] and path[j + 1],
+        or NaN when it needs a missing edge. Works element-wise when j is an array.
+
+        Input:
+        i: int
+            first position of the segment, 1 <= i
+        length: int
+            number of nodes in the segment, i + length <= len(path) - 1
+        j: int or array of int
+            position after which the segment is inserted, outside i - 1..i + length - 1
+        """
+        path = self.path
+        j = np.asarray(j)
+        prev_node = path[i - 1]
+        first = path[i]
+        last = path[i + length - 1]
+        next_node = path[i + length]
+        removed = (self.forward[i] - self.forward[i - 1]
+                   + self.forward[i + length] - self.forward[i + length - 1]
+                   + self.forward[j + 1] - self.forward[j])
+        added = (self.node_graph.distance(prev_node, next_node) + self.node_graph.distance(path[j], first)
+                 + self.node_graph.distance(last, path[j + 1]))
+        return (added - removed)[()]
+
+    def apply_or_opt(self, i, length, j):
+        """
+        Move path[i..i + length - 1] between path[j] and path[j + 1].
+        """
+        segment = self.path[i:i + length]
+        rest = np.concatenate((self.path[:i], self.path[i + length:]))
+        if j > i:
+            j -= length
+        self.path = np.concatenate((rest[:j + 1], segment, rest[j + 1:]))
+        self.refresh()
+
+    def two_opt_moves(self, i, candidates = None):
+        """
+        Return the end positions of the 2-opt moves starting at position i; with candidate lists only
+        the moves that create an edge to a candidate.
+        """
+        if candidates is None:
+            return np.arange(i + 1, self.num_steps)
+        # New edges path[i - 1] -> path[j] and path[i] -> path[j + 1].
+        ends = np.concatenate((self._candidate_positions(self.path[i - 1], candidates),
+                               self._candidate_positions(self.path[i], candidates) - 1))
+        return np.unique(ends[(ends > i) & (ends < self.num_steps)])
+
+    def or_opt_moves(self, i, length, candidates = None):
+        """
+        Return the insertion positions of the Or-opt moves of the segment of a length starting at position i;
+        with candidate lists only the moves that create an edge to a candidate.
+        """
+        if candidates is None:
+            positions = np.arange(self.num_steps)
+        else:
+            # New edges path[j] -> path[i] and path[i + length - 1] -> path[j + 1].
+            first = self._candidate_positions(self.path[i], candidates)
+            last = self._candidate_positions(self.path[i + length - 1], candidates)
+            positions = np.unique(np.concatenate((first, first - 1, last - 1)))
+            positions = positions[(positions >= 0) & (positions < self.num_steps)]
+        return positions[(positions < i - 1) | (positions > i + length - 1)]
+
+    def _candidate_positions(self, node, candidates):
+        nodes = candidates[node]
+        positions = self.pos[nodes[nodes >= 0]]
+        return positions[positions >= 0]
+
+    def move_nodes(self, move):
+        """
+        Return the nodes whose edges change by a move.
+        """
+        kind, arguments = move[0], move[1]
+        if kind == '2-opt':
+            i, j = arguments
+            positions = [i - 1, i, j, j + 1]
+        else:
+            i, length, j = arguments
+            positions = [i - 1, i, i + length - 1, i + length, j, j + 1]
+        return self.path[positions].tolist()
+
+    def random_move(self, kind, rng):
+        """
+        Draw a random move of a kind and return (kind, arguments, delta), or None when the path is too short.
+        """
+        num_steps = self.num_steps
+        if kind == '2-opt':
+            if num_steps < 3:
+                return None
+            i = int(rng.integers(1, num_steps - 1))
+            j = int(rng.integers(i + 1, num_steps))
+            return kind, (i, j), self.two_opt_delta(i, j)
+        length = int(rng.choice(OR_OPT_LENGTHS))
+        if num_steps - length < 2:
+            return None
+        i = int(rng.integers(1, num_steps - length + 1))
+        # Insertion positions outside i - 1..i + length - 1.
+        j = int(rng.integers(0, num_steps - length - 1))
+        if j >= i - 1:
+            j += length + 1
+        return kind, (i, length, j), self.or_opt_delta(i, length, j)
+
+    def apply(self, move):
+        """
+        Apply a move returned by random_move() or best_move().
+        """
+        kind, arguments = move[0], move[1]
+        if kind == '2-opt':
+            self.apply_two_opt(*arguments)
+        else:
+            self.apply_or_opt(*arguments)
+
+    def best_move(self, i, kinds, goal, candidates = None):
+        """
+        Return the best move starting at position i as (kind, arguments, gain), or None when no move is feasible.
+        With candidate lists only the moves that create an edge to a candidate are examined.
+        """
+        best = None
+        for kind in kinds:
+            if kind == '2-opt':
+                ends = self.two_opt_moves(i, candidates)
+                if len(ends) == 0:
+                    continue
+                gains = _gain(self.two_opt_delta(i, ends), goal)
+                k = np.argmax(gains)
+                if best is None or gains[k] > best[2]:
+                    best = (kind, (i, int(ends[k])), gains[k])
+            else:
+                for length in OR_OPT_LENGTHS:
+                    if i + length > self.num_steps - 1:
+                        break
+                    positions = self.or_opt_moves(i, length, candidates)
+                    if len(positions) == 0:
+                        continue
+                    gains = _gain(self.or_opt_delta(i, length, positions), goal)
+                    k = np.argmax(gains)
+                    if best is None or gains[k] > best[2]:
+                        best = (kind, (i, length, int(positions[k])), gains[k])
+        return best
+
+def local_search(path, node_graph, goal = 'min', neighbourhood = 'both', strategy = 'first', max_moves = None,
+                 num_candidates = None, time_limit = None):
+    """
+    Improve a path with 2-opt and Or-opt moves until no move improves it.
+
+    Input:
+    path: list of int
+        node indices of a feasible path
+    node_graph: ArrayGraph or GeometricGraph
+        input graph
+    goal: string
+        use 'max' to lengthen or 'min' to shorten the path
+    neighbourhood: string
+        '2-opt', 'or-opt' or 'both'
+    strategy: string
+        'first' applies the best move of the first position that has an improving move;
+        'best' applies the best move over all positions
+    max_moves: int or None
+        largest number of moves to apply
+    num_candidates: int or None
+        when given, only moves that create an edge to one of the num_candidates best destinations
+        of a node are examined, and nodes without an improving move are skipped by don't-look bits
+        until an edge next to them changes; the candidate lists are cached per graph, see candidate_lists()
+    time_limit: float or None
+        number of seconds after which no further move is searched for
+
+    Output:
+    path: list of int
+        node indices of the improved path
+    dist: float
+        distance of the improved path
+    num_moves: int
+        number of moves applied
+    """
+    tour = Tour(path, node_graph)
+    kinds = NEIGHBOURHOODS[neighbourhood]
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+    if num_candidates is not None:
+        candidates = candidate_lists(node_graph, num_candidates, goal)
+        num_moves = _candidate_search(tour, kinds, goal, strategy, max_moves, candidates, deadline)
+        return tour.path.tolist(), tour.dist, num_moves
+    num_moves = 0
+    improved = True
+    while improved and (max_moves is None or num_moves < max_moves) and (deadline is None or
+                                                                          time.perf_counter() < deadline):
+        improved = False
+        best = None
+        for i in range(1, tour.num_steps - 1):
+            move = tour.best_move(i, kinds, goal)
+            if move is None or move[2] <= _MIN_GAIN:
+                continue
+            if strategy == 'first':
+                best = move
+                break
+            if best is None or move[2] > best[2]:
+                best = move
+        if best is not None:
+            tour.apply(best)
+            num_moves += 1
+            improved = True
+    return tour.path.tolist(), tour.dist, num_moves
+
+def _candidate_search(tour, kinds, goal, strategy, max_moves, candidates, deadline = None):
+    """
+    Local search over candidate moves with don't-look bits. Used internally by local_search().
+    """
+    # A node's don't-look bit is set while none of its moves improve the path.
+    dont_look = np.ones(tour.node_graph.num_nodes, dtype=bool)
+    active = deque(tour.path[1:-1].tolist())
+    dont_look[tour.path[1:-1]] = False
+    num_moves = 0
+    while active and (max_moves is None or num_moves < max_moves) and (deadline is None or
+                                                                         time.perf_counter() < deadline):
+        if strategy == 'first':
+            nodes = [active.popleft()]
+        else:
+            nodes = list(active)
+            active.clear()
+        best = None
+        for node in nodes:
+            dont_look[node] = True
+            i = tour.pos[node]
+            if i < 1 or i > tour.num_steps - 1:
+                continue
+            move = tour.best_move(i, kinds, goal, candidates)
+            if move is None or move[2] <= _MIN_GAIN:
+                continue
+            if best is None or move[2] > best[2]:
+                best = move
+            # Nodes with an improving move stay active.
+            if strategy != 'first':
+                dont_look[node] = False
+                active.append(node)
+        if best is None:
+            continue
+        touched = tour.move_nodes(best)
+        tour.apply(best)
+        num_moves += 1
+        for node in touched:
+            if dont_look[node]:
+                dont_look[node] = False
+                active.append(node)
+    return num_moves
@@ -8,10 +8,287 @@ Based on Chapter Chapter 14 of Introduction to Operations Research (10th Edition
 by Hilier and Lieberman.
 """
 
+import queue
+import threading
+import time
 import numpy as np
-import random as rd
+from collections import OrderedDict, deque
+from Cooling import RandomBlock, accept, make_schedule
+from multiprocessing import Pool
+from os import cpu_count
+from Construction import build_tour
+from Crossover import make_child
+from Feasibility import FAST_TESTS, TESTS, check_feasibility
+import Kernels
+from Graphs import ArrayGraph, as_array_graph, make_rng
+from Instrumentation import SolverStats
+from LocalSearch import NEIGHBOURHOODS, Tour, local_search
 
-def _random_search(start_node, end_node, num_nodes, node_graph, num_trials):
+# Number of random picks tried before the unvisited destinations of a node are listed explicitly.
+_NUM_PROBES = 4
+# Successors passed to the compiled walk when it does not follow parents.
+_NO_PARENT = np.empty(0, dtype=np.int64)
+# Number of dead ends after which a path or a population is given up as not to be found.
+_MAX_ATTEMPTS = 100000
+# Number of dead ends per node after which a child is given up; children are built many times per generation.
+_CHILD_ATTEMPTS_PER_NODE = 10
+# Number of duplicate walks in a row after which a population is taken to hold every path that can be found.
+_MAX_DUPLICATES = 1000
+# Largest number of edges of a graph whose cut vertices the solvers look for before they start, about 30 ms.
+_CUT_VERTEX_MAX_EDGES = 20000
+
+def _pick(uniform, count):
+    """
+    Turn a uniform random number into an index below count, as the kernels of Kernels do.
+    """
+    return min(int(uniform * count), count - 1)
+
+def _construct_tour(start_node, end_node, num_nodes, node_graph, rng, choose = None):
+    """
+    Build one path by a random walk that never revisits a node. Used by all the solvers.
+
+    Visited nodes are kept in a boolean array, so every step costs O(degree) at most.
+    A step may only return to a visited node when it is the end node on the last step.
+    The random numbers of the walk are drawn as one block beforehand, one row per step, so the
+    compiled walk of Kernels gives the same path for an ArrayGraph when that backend is selected.
+
+    Input:
+    start_node: int
+        starting node index
+    end_node: int
+        end node index
+    num_nodes: int
+        number of steps of the path
+    node_graph: ArrayGraph
+        input graph
+    rng: np.random.Generator
+        random generator used to pick destinations
+    choose: tuple or None
+        (successors1, successors2, mutation_rate) walks along the edges of two parents, see _child_solution();
+        None picks uniformly among the allowed destinations
+
+    Output:
+    path: list of int or None
+        node indices of the path; None when the walk hit a dead end
+    dist: int or float or None
+        distance of the path
+    """
+    draws = rng.random((num_nodes, _NUM_PROBES + 1))
+    if Kernels.BACKEND == 'compiled' and isinstance(node_graph, ArrayGraph):
+        successors1, successors2, mutation_rate = choose if choose is not None else (_NO_PARENT, _NO_PARENT, 0.0)
+        path, dist, found = Kernels.walk(node_graph.indptr, node_graph.indices, node_graph.weights, start_node,
+                                         end_node, num_nodes, draws, successors1, successors2, mutation_rate)
+        if not found:
+            return None, None
+        return path.tolist(), np.float64(dist)
+    visited = np.zeros(node_graph.num_nodes, dtype=bool)
+    visited[start_node] = True
+    path = [start_node]
+    dist = 0
+    current_node = start_node
+    for j in range(num_nodes):
+        destinations = node_graph.neighbours(current_node)
+        last_step = j == num_nodes - 1
+        destination = None
+        if choose is None and len(destinations) > 0:
+            # Random picks find an unvisited destination quickly while most of the graph is unvisited.
+            for k in range(_NUM_PROBES):
+                candidate = destinations[_pick(draws[j, k], len(destinations))]
+                if not visited[candidate] or (last_step and candidate == end_node):
+                    destination = candidate
+                    break
+        if destination is None:
+            allowed = ~visited[destinations]
+            if last_step:
+                allowed |= destinations == end_node
+            if choose is None:
+                candidates = np.flatnonzero(allowed)
+                if len(candidates) > 0:
+                    destination = destinations[candidates[_pick(draws[j, _NUM_PROBES], len(candidates))]]
+            else:
+                destination = _choose_parent(current_node, destinations, allowed, draws[j], *choose)
+            if destination is None:
+                return None, None
+        destination = int(destination)
+        visited[destination] = True
+        path.append(destination)
+        dist += node_graph.distance(current_node, destination)
+        current_node = destination
+    return path, dist
+
+def _tour_key(path, canonical = False):
+    """
+    Return a hashable key of a path.
+
+    Input:
+    path: list of int
+        nodes of the path
+    canonical: boolean
+        whether a closed path is rotated to start at its smallest node and turned to the direction
+        with the smaller second node, so all rotations and reversals of a tour share one key
+    """
+    if not canonical or len(path) < 3 or path[0] != path[-1]:
+        return tuple(path)
+    cycle = path[:-1]
+    first = cycle.index(min(cycle))
+    cycle = cycle[first:] + cycle[:first]
+    if cycle[-1] < cycle[1]:
+        cycle = cycle[:1] + cycle[:0:-1]
+    return tuple(cycle)
+
+class _TourSet:
+    """
+    Set of the paths found so far, used to skip paths that were already found.
+
+    Paths are stored as hashed tuples, so checking a path costs O(n) instead of a scan over every
+    path found so far. With max_size only that many of the most recently seen paths are kept.
+    """
+
+    def __init__(self, canonical = False, max_size = None):
+        self.canonical = canonical
+        self.max_size = max_size
+        if max_size is None:
+            self._seen = set()
+        else:
+            self._seen = OrderedDict()
+
+    def add(self, path):
+        """
+        Add a path to the set and return whether it was new.
+        """
+        key = _tour_key(path, self.canonical)
+        if self.max_size is None:
+            if key in self._seen:
+                return False
+            self._seen.add(key)
+            return True
+        # Only the hash of a path is kept to bound memory.
+        key = hash(key)
+        if key in self._seen:
+            self._seen.move_to_end(key)
+            return False
+        self._seen[key] = None
+        if len(self._seen) > self.max_size:
+            self._seen.popitem(last=False)
+        return True
+
+class _Stopping:
+    """
+    Wall-clock deadline, patience, stop predicate and incumbent callback shared by the solvers.
+    """
+
+    def __init__(self, goal, time_limit = None, patience = None, callback = None, stats = None,
+                 should_stop = None):
+        self.goal = goal
+        self.deadline = None if time_limit is None else time.perf_counter() + time_limit
+        self.patience = patience
+        self.callback = callback
+        self.should_stop = should_stop
+        self.best_dist = None
+        self.since_best = 0
+        self.stats = stats
+        self.iteration = 0
+
+    def check(self, path, dist, node_graph):
+        """
+        Record the best path of an iteration, or None, and return True when the search should stop.
+        A new best path is passed to the callback in node labels; the search stops when it returns True,
+        or when should_stop() returns True at the end of any iteration.
+        """
+        self.iteration += 1
+        if path is not None and (self.best_dist is None or (dist > self.best_dist if self.goal == 'max'
+                                                            else dist < self.best_dist)):
+            self.best_dist = dist
+            self.since_best = 0
+            if self.stats is not None:
+                self.stats.improved(self.iteration, dist)
+            if self.callback is not None and self.callback(node_graph.path_labels(path), dist):
+                return True
+        else:
+            self.since_best += 1
+            if self.patience is not None and self.since_best >= self.patience:
+                return True
+        if self.should_stop is not None and self.should_stop():
+            return True
+        return self.deadline is not None and time.perf_counter() >= self.deadline
+
+def _infeasible(start_node, end_node, num_nodes, node_graph, stats = None):
+    """
+    Return True when a test of Feasibility proves that no path exists, so a solver can stop before it starts.
+    The vectorized tests take linear time in the number of edges; the depth-first search of the cut vertex
+    test runs in Python, so it is only run on graphs of at most _CUT_VERTEX_MAX_EDGES edges.
+    """
+    tests = TESTS if node_graph.num_edges <= _CUT_VERTEX_MAX_EDGES else FAST_TESTS
+    feasible, reason = check_feasibility(start_node, end_node, num_nodes, node_graph, tests)
+    if feasible is False and stats is not None:
+        stats.count('infeasible_' + reason)
+    return feasible is False
+
+def _finish(stats, *result):
+    """
+    Return the result of a solver, followed by its statistics when they were collected.
+    """
+    if stats is None:
+        return result
+    stats.finish()
+    return result + (stats,)
+
+def _count_move(stats, feasible, accepted):
+    """
+    Count a move tried by a solver.
+    """
+    stats.count('moves_proposed')
+    if not feasible:
+        stats.count('moves_infeasible')
+    elif accepted:
+        stats.count('moves_accepted')
+    else:
+        stats.count('moves_rejected')
+
+def iter_incumbents(solver, *args, **kwargs):
+    """
+    Run a solver in a background thread and yield its best path every time it improves.
+
+    Closing the generator, for example by leaving a for loop early, makes the solver stop after its
+    current iteration; the return value of the solver is the return value of the generator.
+
+    Input:
+    solver: function
+        a solver of this module or Exact.branch_and_bound(), which takes callback and should_stop arguments
+    args, kwargs:
+        arguments of the solver
+
+    Output:
+    best_path, best_dist: list of int, int or float
+        yielded for every improvement of the best path
+    """
+    found = queue.Queue()
+    stop = threading.Event()
+
+    def callback(path, dist):
+        found.put(('best', (path, dist)))
+        return stop.is_set()
+
+    def run():
+        try:
+            found.put(('done', solver(*args, callback=callback, should_stop=stop.is_set, **kwargs)))
+        except BaseException as error:
+            found.put(('error', error))
+
+    threading.Thread(target=run, daemon=True).start()
+    try:
+        while True:
+            kind, item = found.get()
+            if kind == 'best':
+                yield item
+            elif kind == 'error':
+                raise item
+            else:
+                return item
+    finally:
+        stop.set()
+
+def _random_search(start_node, end_node, num_nodes, node_graph, num_trials, rng = None):
     """
     Implementation of a random search. Used internally in other functions. 
 
@@ -22,50 +299,38 @@ def _random_search(start_node, end_node, num_nodes, node_graph, num_trials):
         end node of a travelling salesman problem 
     num_nodes: int
         number of nodes of an input graph
-    node_graph: dict
-        input graph generated by proprietary generate_graph() function
+    node_graph: ArrayGraph
+        input graph; start_node, end_node and the returned paths are node indices
     num_trails: int
-        number of a valid paths to be found; a same path can be find multiple times 
+        number of random walks; a walk that reaches a dead end counts, and a same path can be found multiple times
+    rng: None, int, SeedSequence or Generator
+        random generator or seed, see Graphs.make_rng()
 
     Output:
     path_out: list of lists of int
-        list that contains all unique paths found by the algorithm; a path is a list of integers representing nodes
+        list that contains all unique paths found by the algorithm; a path is a list of integers representing node indices
     dist_out: list of int or float
         list containing distances of identified paths  
     """
 
+    rng = make_rng(rng)
     i = 0
     path_out = []
     dist_out = []
+    path_set = _TourSet()
     while i < num_trials:
-        j = 0
-        path = []
-        dist = 0
-        current_node = start_node
-        path.append(current_node)
-        while j <= num_nodes:
-            destination_list = list(node_graph[current_node].keys())
-            rd.shuffle(destination_list)
-            k = 0
-            max_dest = len(destination_list)
-            for destination in destination_list:  
-                if (destination not in path) or ((destination == end_node) and (j == (num_nodes - 1))):
-                    path.append(destination)
-                    dist += node_graph[current_node][destination]
-                    current_node = destination
-                    j += 1
-                    break
-                else: 
-                    k += 1
-            if max_dest == k:
-                i += 1
-                break
-        if path not in path_out and (len(path) == (num_nodes + 1)):       
+        i += 1
+        path, dist = _construct_tour(start_node, end_node, num_nodes, node_graph, rng)
+        if path is not None and path_set.add(path):
             path_out.append(path)
             dist_out.append(dist)
     return path_out, dist_out
 
-def random_search(start_node, end_node, num_nodes, node_graph, num_trials, goal = 'max'):
+
+def random_search(start_node, end_node, num_nodes, node_graph, num_trials, goal = 'max', rng = None,
+                  canonical = False, memory = None, time_limit = None, patience = None, callback = None,
+                  should_stop = None, precheck = True,
+                  stats = False):
     
     """
     Implementation of a random search to find longest or shortest solution of 
@@ -77,12 +342,32 @@ def random_search(start_node, end_node, num_nodes, node_graph, num_trials, goal
         end node of a travelling salesman problem 
     num_nodes: int
         number of nodes of an input graph
-    node_graph: dict
-        input graph generated by proprietary generate_graph() function
+    node_graph: dict or ArrayGraph
+        input graph generated by proprietary generate_graph() function or its array form
     num_trails: int
-        number of a valid paths to be found; a same path can be find multiple times
+        number of random walks; a walk that reaches a dead end counts, and a same path can be found multiple times
     goal: string
         use 'max' to return the longest or 'min' to run the shortest path  
+    rng: None, int, SeedSequence or Generator
+        random generator or seed used to pick destinations, see Graphs.make_rng()
+    canonical: boolean
+        count rotations and reversals of a closed path as the same path
+    memory: int or None
+        remember only this many recently found paths when skipping duplicates, and report only them in
+        data_out; a path forgotten this way can be found again; None remembers and reports every path
+    time_limit: float or None
+        number of seconds after which the search stops and returns the best path found so far
+    patience: int or None
+        number of trials without a new best path after which the search stops
+    callback: function or None
+        called as callback(best_path, best_dist) with every new best path; returning True stops the search
+    should_stop: function or None
+        called without arguments after every iteration; returning True stops the search
+    precheck: boolean
+        run the tests of Feasibility first and return no path when they prove that none exists
+    stats: boolean
+        collect counters, phase timers and the improvement trajectory, returned as a last
+        Instrumentation.SolverStats output
 
     Output:
     best_path: list of int
@@ -91,41 +376,40 @@ def random_search(start_node, end_node, num_nodes, node_graph, num_trials, goal
         distance of the best path
     data_out: dict
         path_out: list of lists of int
-            list that contains all unique paths found by the algorithm; a path is a list of integers representing nodes
+            list that contains all unique paths found by the algorithm, or the last memory of them; a path is a
+            list of integers representing nodes
         dist_out: list of int or float
             list containing distances of identified paths  
+    stats: SolverStats
+        only returned when stats is True
     """
 
+    node_graph = as_array_graph(node_graph)
+    stats = SolverStats() if stats else None
+    if precheck and _infeasible(start_node, end_node, num_nodes, node_graph, stats):
+        return _finish(stats, None, None, {'Paths': [], 'Distances': []} if num_trials > 0 else {})
+    start_node = node_graph.index_of(start_node)
+    end_node = node_graph.index_of(end_node)
+    rng = make_rng(rng)
     i = 0
-    path_out = []
-    dist_out = []
+    # With memory set, the reported paths are bounded like the remembered ones.
+    path_out = [] if memory is None else deque(maxlen=memory)
+    dist_out = [] if memory is None else deque(maxlen=memory)
     best_path = None
     best_dist = None
     data_out = {}
+    path_set = _TourSet(canonical, memory)
+    stopping = _Stopping(goal, time_limit, patience, callback, stats, should_stop)
     while i < num_trials:
-        j = 0
-        path = []
-        dist = 0
-        current_node = start_node
-        path.append(current_node)
-        while j <= num_nodes:
-            destination_list = list(node_graph[current_node].keys())
-            rd.shuffle(destination_list)
-            k = 0
-            max_dest = len(destination_list)
-            for destination in destination_list:
-                if (destination not in path) or ((destination == end_node) and (j == (num_nodes - 1))):
-                    path.append(destination)
-                    dist += node_graph[current_node][destination]
-                    current_node = destination
-                    j += 1
-                    break
-                else: 
-                    k += 1
-            if max_dest == k:
-                i += 1
-                break
-        if path not in path_out and (len(path) == (num_nodes + 1)):       
+        i += 1
+        path, dist = _construct_tour(start_node, end_node, num_nodes, node_graph, rng)
+        if stats is not None:
+            stats.count('dead_ends' if path is None else 'tours_constructed')
+        if path is not None and not path_set.add(path):
+            path = None
+            if stats is not None:
+                stats.count('duplicate_tours')
+        if path is not None:
             path_out.append(path)
             dist_out.append(dist)
             if goal == 'max':
@@ -144,39 +428,42 @@ def random_search(start_node, end_node, num_nodes, node_graph, num_trials, goal
                     best_path = path
         data_out['Paths'] = path_out
         data_out['Distances'] = dist_out
-    return best_path, best_dist, data_out
+        if stopping.check(path, dist, node_graph):
+            break
+    # Report the paths in node labels of the input graph.
+    if best_path is not None:
+        best_path = node_graph.path_labels(best_path)
+    if 'Paths' in data_out:
+        data_out['Paths'] = [node_graph.path_labels(path) for path in path_out]
+        data_out['Distances'] = list(dist_out)
+    return _finish(stats, best_path, best_dist, data_out)
        
-def _random_search_solution(start_node, end_node, num_nodes, node_graph): 
+def _random_search_solution(start_node, end_node, num_nodes, node_graph, rng, stats = None): 
     
     path_out = None
     dist_out = None
-    while path_out is None: 
-        j = 0
-        path = []
-        dist = 0
-        current_node = start_node
-        path.append(current_node)
-        while j <= num_nodes:
-            destination_list = list(node_graph[current_node].keys())
-            rd.shuffle(destination_list)
-            k = 0
-            max_dest = len(destination_list) 
-            for destination in destination_list: 
-                if (destination not in path) or ((destination == end_node) and (j == (num_nodes - 1))):
-                    path.append(destination)
-                    dist += node_graph[current_node][destination]
-                    current_node = destination
-                    j += 1
-                    break
-                else: 
-                    k += 1
-            if max_dest == k:
-                break
-        if (len(path) == (num_nodes + 1)):       
-            path_out = path
-            dist_out = dist 
+    attempts = 0
+    # Give up after _MAX_ATTEMPTS dead ends, as a graph that passes the feasibility tests may still have no path.
+    while path_out is None and attempts < _MAX_ATTEMPTS: 
+        attempts += 1
+        path_out, dist_out = _construct_tour(start_node, end_node, num_nodes, node_graph, rng)
+        if stats is not None:
+            stats.count('dead_ends' if path_out is None else 'tours_constructed')
     return path_out, dist_out
 
+def _initial_solution(start_node, end_node, num_nodes, node_graph, rng, initial, goal, stats = None):
+    """
+    Return the starting path of a solver: a random walk for initial 'random', otherwise the path of a
+    Construction heuristic, or a random walk when the heuristic finds none.
+    """
+    if initial != 'random':
+        path, dist = build_tour(start_node, end_node, num_nodes, node_graph, initial, 'max' if goal == 'max' else 'min')
+        if stats is not None:
+            stats.count('construction_failures' if path is None else 'tours_constructed')
+        if path is not None:
+            return path, dist
+    return _random_search_solution(start_node, end_node, num_nodes, node_graph, rng, stats)
+
 def sub_tours(graph, current_node):
     
     destinations = list(graph[current_node].keys())
@@ -195,21 +482,23 @@ def subtour_map(graph):
         subtourmap[node] = sub_tours(graph, node)
     return subtourmap
 
-def _local_sub_tours(graph, current_node, subtour_map = {}):
+def _local_sub_tours(graph, current_node, subtour_map = None):
     
+    if subtour_map is None:
+        subtour_map = {}
     if current_node not in subtour_map.keys():
         subtour_map[current_node] = sub_tours(graph, current_node)
     return subtour_map
 
 def _subtour_dist(start_node, subtour, end_node, node_graph):
     
-    old_dist = node_graph[start_node][subtour[0]] + node_graph[subtour[0]][subtour[1]] + node_graph[subtour[1]][end_node]
-    new_dist = node_graph[start_node][subtour[1]] + node_graph[subtour[1]][subtour[0]] + node_graph[subtour[0]][end_node]
+    old_dist = node_graph.distance(start_node, subtour[0]) + node_graph.distance(subtour[0], subtour[1]) + node_graph.distance(subtour[1], end_node)
+    new_dist = node_graph.distance(start_node, subtour[1]) + node_graph.distance(subtour[1], subtour[0]) + node_graph.distance(subtour[0], end_node)
     return new_dist - old_dist
 
 def _test_subtour(start_node, subtour, end_node, node_graph):
     
-    if (subtour[1] in list(node_graph[start_node].keys())) and (subtour[0] in list(node_graph[subtour[1]].keys())) and (end_node in list(node_graph[subtour[0]].keys())):
+    if node_graph.has_edge(start_node, subtour[1]) and node_graph.has_edge(subtour[1], subtour[0]) and node_graph.has_edge(subtour[0], end_node):
         feasible = True
     else:
         feasible = False
@@ -217,229 +506,748 @@ def _test_subtour(start_node, subtour, end_node, node_graph):
 
 def _evaluate_path(path, node_graph):
     
-    dist = 0
-    num_nodes = len(path) - 1
-    for i in np.arange(num_nodes):
-        dist += node_graph[path[i]][path[i + 1]]
-    return dist
+    return node_graph.path_distance(path)
 
-def sub_tour_reversal(start_node, end_node, num_nodes, node_graph, num_trials, goal = 'max'):
-    
-    # Generate a random solution.
-    best_path, best_dist = _random_search_solution(start_node, end_node, num_nodes, node_graph)
+def sub_tour_reversal(start_node, end_node, num_nodes, node_graph, num_trials, goal = 'max', rng = None,
+                      neighbourhood = 'swap', strategy = 'random', num_candidates = None, initial = 'random',
+                      time_limit = None, patience = None, callback = None, should_stop = None, precheck = True,
+                      stats = False):
+    """
+    Implementation of a random sub-tour reversal to find longest or shortest solution.
+
+    Input:
+    start_node: int
+        starting node of a travelling salesman problem
+    end_node: int
+        end node of a travelling salesman problem 
+    num_nodes: int
+        number of nodes of an input graph
+    node_graph: dict or ArrayGraph
+        input graph generated by proprietary generate_graph() function or its array form
+    num_trails: int
+        number of moves to try; the largest number of moves to apply for 'first' and 'best' strategies
+    goal: string
+        use 'max' to return the longest or 'min' to run the shortest path; 'search' accepts every move
+    rng: None, int, SeedSequence or Generator
+        random generator or seed, see Graphs.make_rng()
+    neighbourhood: string
+        'swap' reverses two adjacent nodes; '2-opt', 'or-opt' or 'both' use the moves of LocalSearch
+    strategy: string
+        'random' tries random moves; 'first' or 'best' runs LocalSearch.local_search() with the
+        first-improvement or best-improvement strategy
+    num_candidates: int or None
+        for 'first' and 'best' strategies, only examine moves towards the num_candidates nearest
+        (or farthest for 'max') destinations of a node; the lists are cached per graph object, so pass
+        an ArrayGraph rather than a dict to reuse them over calls
+    initial: string
+        starting path: 'random' for a random walk, or a heuristic of Construction ('nearest_neighbour',
+        'greedy_edge' or 'space_filling_curve'); a random walk is used when the heuristic finds no path
+    time_limit: float or None
+        number of seconds after which the search stops and returns the best path found so far
+    patience: int or None
+        number of moves without a new best path after which the 'random' strategy stops
+    callback: function or None
+        called as callback(best_path, best_dist) with every new best path; returning True stops the search
+    should_stop: function or None
+        called without arguments after every iteration; returning True stops the search
+    precheck: boolean
+        run the tests of Feasibility first and return no path when they prove that none exists
+    stats: boolean
+        collect counters, phase timers and the improvement trajectory, returned as a last
+        Instrumentation.SolverStats output
+
+    Output:
+    best_path: list of int
+        a list of integers representing nodes of the best path
+    best_dist: int or float
+        distance of the best path
+    stats: SolverStats
+        only returned when stats is True
+    """
+    node_graph = as_array_graph(node_graph)
+    stats = SolverStats() if stats else None
+    if precheck and _infeasible(start_node, end_node, num_nodes, node_graph, stats):
+        return _finish(stats, None, None)
+    start_node = node_graph.index_of(start_node)
+    end_node = node_graph.index_of(end_node)
+    rng = make_rng(rng)
+    # Generate a starting solution.
+    best_path, best_dist = _initial_solution(start_node, end_node, num_nodes, node_graph, rng, initial, goal, stats)
+    if best_path is None:
+        return _finish(stats, None, None)
+    stopping = _Stopping(goal, time_limit, patience, callback, stats, should_stop)
+    if stopping.check(best_path, best_dist, node_graph):
+        return _finish(stats, node_graph.path_labels(best_path), best_dist)
+    if neighbourhood != 'swap':
+        if strategy != 'random':
+            time_left = None if stopping.deadline is None else stopping.deadline - time.perf_counter()
+            best_path, best_dist, num_moves = local_search(best_path, node_graph, goal, neighbourhood, strategy,
+                                                           num_trials, num_candidates, time_left)
+            if stats is not None:
+                stats.count('moves_accepted', num_moves)
+            stopping.check(best_path, best_dist, node_graph)
+            return _finish(stats, node_graph.path_labels(best_path), best_dist)
+        # Start performing random 2-opt or Or-opt moves.
+        tour = Tour(best_path, node_graph)
+        kinds = NEIGHBOURHOODS[neighbourhood]
+        i = 0
+        while i < num_trials:
+            i += 1
+            move = tour.random_move(kinds[rng.integers(len(kinds))], rng)
+            feasible = move is not None and not np.isnan(move[2])
+            accepted = False
+            if feasible:
+                sub_dist = move[2]
+                accepted = (goal == 'max' and sub_dist >= 0) or (goal == 'min' and sub_dist <= 0) or goal == 'search'
+                if accepted:
+                    tour.apply(move)
+            if stats is not None:
+                _count_move(stats, feasible, accepted)
+            if stopping.check(tour.path, tour.dist, node_graph):
+                break
+        return _finish(stats, node_graph.path_labels(tour.path), tour.dist)
     # Start performing random sub-tour reversals.
     i = 0
     while i < num_trials:
         i += 1
-        random_position = np.random.randint(1, num_nodes - 1)
+        random_position = rng.integers(1, num_nodes - 1)
         start_node = best_path[random_position - 1]
         subtour = (best_path[random_position], best_path[random_position + 1])
         end_node = best_path[random_position + 2]
-        if _test_subtour(start_node, subtour, end_node, node_graph):
+        feasible = _test_subtour(start_node, subtour, end_node, node_graph)
+        accepted = False
+        if feasible:
             sub_dist = _subtour_dist(start_node, subtour, end_node, node_graph)
-            if goal == 'max':
-                if sub_dist >= 0:
-                    best_path[random_position] = subtour[1]
-                    best_path[random_position + 1] = subtour[0]
-                    best_dist += sub_dist
-            if goal == 'min':
-                if sub_dist <= 0:
-                    best_path[random_position] = subtour[1]
-                    best_path[random_position + 1] = subtour[0]
-                    best_dist += sub_dist
-            if goal == 'search':
+            accepted = (goal == 'max' and sub_dist >= 0) or (goal == 'min' and sub_dist <= 0) or goal == 'search'
+            if accepted:
                 best_path[random_position] = subtour[1]
                 best_path[random_position + 1] = subtour[0]
                 best_dist += sub_dist
-    return best_path, best_dist
+        if stats is not None:
+            _count_move(stats, feasible, accepted)
+        if stopping.check(best_path, best_dist, node_graph):
+            break
+    return _finish(stats, node_graph.path_labels(best_path), best_dist)
 
-def simulated_annealing(start_node, end_node, num_nodes, node_graph, num_trials, goal = 'max'):
-    
-    # Generate a random solution.
-    best_path, best_dist = _random_search_solution(start_node, end_node, num_nodes, node_graph)
-    # Start performing random sub-tour reversals.
+def simulated_annealing(start_node, end_node, num_nodes, node_graph, num_trials, goal = 'max', rng = None,
+                        neighbourhood = 'swap', schedule = 'accept', initial_temperature = None, cooling_rate = None,
+                        reheat_after = None, initial = 'random', patience = None, time_limit = None, callback = None,
+                        should_stop = None, precheck = True, stats = False):
+    """
+    Implementation of a simulated annealing to find longest or shortest solution.
+
+    Input:
+    start_node: int
+        starting node of a travelling salesman problem
+    end_node: int
+        end node of a travelling salesman problem 
+    num_nodes: int
+        number of nodes of an input graph
+    node_graph: dict or ArrayGraph
+        input graph generated by proprietary generate_graph() function or its array form
+    num_trails: int
+        number of moves to try
+    goal: string
+        use 'max' to return the longest or 'min' to run the shortest path
+    rng: None, int, SeedSequence or Generator
+        random generator or seed, see Graphs.make_rng()
+    neighbourhood: string
+        'swap' reverses two adjacent nodes; '2-opt', 'or-opt' or 'both' use the moves of LocalSearch
+    schedule: string or Cooling.CoolingSchedule
+        'accept' cools on every accepted move, 'geometric' and 'lundy-mees' on every move, 'adaptive'
+        follows a falling acceptance ratio; see Cooling.make_schedule()
+    initial_temperature: float or None
+        starting temperature; None uses 0.2 times the distance of the starting path
+    cooling_rate: float or None
+        parameter of the schedule, see Cooling.make_schedule()
+    reheat_after: int or None
+        number of moves without a new best path after which the temperature returns to its start
+    initial: string
+        starting path: 'random' for a random walk, or a heuristic of Construction, see sub_tour_reversal()
+    patience: int or None
+        number of moves without a new best path after which the search stops
+    time_limit: float or None
+        number of seconds after which the search stops and returns the best path found so far
+    callback: function or None
+        called as callback(best_path, best_dist) with every new best path; returning True stops the search
+    should_stop: function or None
+        called without arguments after every iteration; returning True stops the search
+    precheck: boolean
+        run the tests of Feasibility first and return no path when they prove that none exists
+    stats: boolean
+        collect counters, phase timers and the improvement trajectory, returned as a last
+        Instrumentation.SolverStats output
+
+    Output:
+    best_path: list of int
+        a list of integers representing nodes of the best path found
+    best_dist: int or float
+        distance of the best path found
+    stats: SolverStats
+        only returned when stats is True
+    """
+    node_graph = as_array_graph(node_graph)
+    stats = SolverStats() if stats else None
+    if precheck and _infeasible(start_node, end_node, num_nodes, node_graph, stats):
+        return _finish(stats, None, None)
+    start_node = node_graph.index_of(start_node)
+    end_node = node_graph.index_of(end_node)
+    rng = make_rng(rng)
+    # Generate a starting solution.
+    path, dist = _initial_solution(start_node, end_node, num_nodes, node_graph, rng, initial, goal, stats)
+    if path is None:
+        return _finish(stats, None, None)
+    if initial_temperature is None:
+        initial_temperature = abs(dist) * 0.2
+    cooling = make_schedule(schedule, initial_temperature, num_trials, cooling_rate)
+    draws = RandomBlock(rng)
+    sign = -1 if goal == 'max' else 1
+    tour = None
+    if neighbourhood != 'swap':
+        # Perform random 2-opt or Or-opt moves on the tour; otherwise random sub-tour reversals on the path.
+        tour = Tour(path, node_graph)
+        kinds = NEIGHBOURHOODS[neighbourhood]
+    best_path, best_dist = list(path), dist
+    stopping = _Stopping(goal, time_limit, patience, callback, stats, should_stop)
+    if stopping.check(best_path, best_dist, node_graph):
+        return _finish(stats, node_graph.path_labels(best_path), best_dist)
+    since_reheat = 0
     i = 0
-    T = best_dist * 0.2
     while i < num_trials:
         i += 1
-        random_position = np.random.randint(1, num_nodes - 1)
-        start_node = best_path[random_position - 1]
-        subtour = (best_path[random_position], best_path[random_position + 1])
-        end_node = best_path[random_position + 2]
-        if _test_subtour(start_node, subtour, end_node, node_graph):
-            sub_dist = _subtour_dist(start_node, subtour, end_node, node_graph)
-            if goal == 'max': 
-                if np.random.random() < np.exp(sub_dist/T) :
-                    best_path[random_position] = subtour[1]
-                    best_path[random_position + 1] = subtour[0]
-                    best_dist += sub_dist
-                    T = T * 0.8 
-            if goal == 'min':
-                if np.random.random() < np.exp(-sub_dist/T) :
-                    best_path[random_position] = subtour[1]
-                    best_path[random_position + 1] = subtour[0]
-                    best_dist += sub_dist
-                    T = T * 0.8 
-    return best_path, best_dist
+        accepted = False
+        if tour is not None:
+            move = tour.random_move(kinds[draws.integers(len(kinds))], draws)
+            feasible = move is not None and not np.isnan(move[2])
+            if feasible:
+                sub_dist = move[2]
+                accepted = accept(sign * sub_dist, cooling.temperature, draws.random())
+                if accepted:
+                    tour.apply(move)
+                    dist = tour.dist
+        else:
+            random_position = draws.integers(1, num_nodes - 1)
+            subtour = (path[random_position], path[random_position + 1])
+            feasible = _test_subtour(path[random_position - 1], subtour, path[random_position + 2], node_graph)
+            if feasible:
+                sub_dist = _subtour_dist(path[random_position - 1], subtour, path[random_position + 2], node_graph)
+                accepted = accept(sign * sub_dist, cooling.temperature, draws.random())
+                if accepted:
+                    path[random_position] = subtour[1]
+                    path[random_position + 1] = subtour[0]
+                    dist += sub_dist
+        cooling.update(accepted)
+        if stats is not None:
+            _count_move(stats, feasible, accepted)
+        if accepted and sign * (dist - best_dist) < 0:
+            best_path = list(tour.path) if tour is not None else list(path)
+            best_dist = dist
+            since_reheat = 0
+        else:
+            since_reheat += 1
+            if reheat_after is not None and since_reheat >= reheat_after:
+                cooling.reheat()
+                since_reheat = 0
+                if stats is not None:
+                    stats.count('reheats')
+        if stopping.check(best_path, best_dist, node_graph):
+            break
+    return _finish(stats, node_graph.path_labels(best_path), best_dist)
 
+def _population_best(pop_path, pop_dist, goal, best_path = None, best_dist = None):
+    """
+    Return the best path of a population and its distance, or the given best path when the population
+    has none better.
+    """
+    if len(pop_dist) == 0:
+        return best_path, best_dist
+    best = np.argmax(pop_dist) if goal == 'max' else np.argmin(pop_dist)
+    if best_dist is None or (pop_dist[best] > best_dist if goal == 'max' else pop_dist[best] < best_dist):
+        return pop_path[best], pop_dist[best]
+    return best_path, best_dist
 
-def _random_search_population(start_node, end_node, num_nodes, node_graph, num_trials):
+def _random_search_population(start_node, end_node, num_nodes, node_graph, num_trials, rng, stats = None):
     
     i = 0
     path_out = []
-    dist_out = []
-    while i < num_trials:
-        j = 0
-        path = []
-        dist = 0
-        current_node = start_node
-        path.append(current_node)
-        while j <= num_nodes:
-            destination_list = list(node_graph[current_node].keys())
-            rd.shuffle(destination_list) 
-            k = 0
-            max_dest = len(destination_list)
-            for destination in destination_list:            
-                if (destination not in path) or ((destination == end_node) and (j == (num_nodes - 1))):
-                    path.append(destination)
-                    dist += node_graph[current_node][destination]
-                    current_node = destination
-                    j += 1
-                    break
-                else: 
-                    k += 1
-            if max_dest == k:
-                break
-        if path not in path_out and (len(path) == (num_nodes + 1)): 
+    path_set = _TourSet()
+    dead_ends = 0
+    duplicates = 0
+    # A graph may have no path, or fewer distinct paths than the population holds.
+    while i < num_trials and dead_ends < _MAX_ATTEMPTS and duplicates < _MAX_DUPLICATES:
+        path, _ = _construct_tour(start_node, end_node, num_nodes, node_graph, rng)
+        if stats is not None:
+            stats.count('dead_ends' if path is None else 'tours_constructed')
+        if path is None:
+            dead_ends += 1
+        elif path_set.add(path):
             i += 1
+            duplicates = 0
             path_out.append(path)
-            dist_out.append(dist)
-    return path_out, dist_out
-    
-def _child_solution(start_node, end_node, num_nodes, node_graph, parent1, parent2, mutation_rate):
+        else:
+            duplicates += 1
+            if stats is not None:
+                stats.count('duplicate_tours')
+    # The population is held as a 2D array with one path per row.
+    pop_path = np.array(path_out, dtype=np.int64).reshape(-1, num_nodes + 1)
+    if 0 < len(pop_path) < num_trials:
+        # Repeat the distinct paths found to fill the population.
+        pop_path = np.resize(pop_path, (num_trials, num_nodes + 1))
+    return pop_path, _evaluate_population(pop_path, node_graph)
+
+def _seed_population(start_node, end_node, num_nodes, node_graph, pop_path, pop_size, initial, goal, stats = None):
+    """
+    Put the paths of Construction heuristics in place of the first members of a population, or fill
+    the population with them when the random walks found no path.
+
+    Input:
+    initial: string or list of string
+        'random' leaves the population as it is; heuristic names each seed one path
+    """
+    methods = [initial] if isinstance(initial, str) else list(initial)
+    seeds = []
+    for method in methods:
+        if method == 'random':
+            continue
+        path, _ = build_tour(start_node, end_node, num_nodes, node_graph, method, 'max' if goal == 'max' else 'min')
+        if stats is not None:
+            stats.count('construction_failures' if path is None else 'tours_constructed')
+        if path is not None:
+            seeds.append(path)
+    if not seeds:
+        return pop_path, None
+    seeds = np.array(seeds, dtype=np.int64)
+    if len(pop_path) == 0:
+        pop_path = np.resize(seeds, (pop_size, num_nodes + 1))
+    else:
+        pop_path = pop_path.copy()
+        pop_path[:len(seeds)] = seeds[:len(pop_path)]
+    return pop_path, _evaluate_population(pop_path, node_graph)
+
+def _evaluate_population(pop_path, node_graph):
+    """
+    Return the distance of every path of a population with one gather-and-sum over its edges.
+    """
+    return np.sum(node_graph.distance(pop_path[:, :-1], pop_path[:, 1:]), axis=1)
+
+def _successors(pop_path, num_graph_nodes):
+    """
+    Return an array where successors[p, node] is the node that follows node in path p, or -1.
+    """
+    successors = np.full((len(pop_path), num_graph_nodes), -1, dtype=np.int64)
+    successors[np.arange(len(pop_path))[:, None], pop_path[:, :-1]] = pop_path[:, 1:]
+    return successors
+
+def _select(pop_dist, num_select, goal, rng, selection = 'roulette', tournament_size = 3):
+    """
+    Select indices of a population with NumPy sampling.
+
+    Input:
+    pop_dist: array of float
+        distances of the population
+    num_select: int
+        number of indices to select
+    goal: string
+        'max' prefers long paths and 'min' short paths
+    rng: np.random.Generator
+        random generator
+    selection: string
+        'roulette' draws distinct indices with probabilities proportional to fitness;
+        'tournament' returns the best of tournament_size random indices for every selection
+
+    Output:
+    index: array of int
+    """
+    if selection == 'tournament':
+        contestants = rng.integers(len(pop_dist), size=(num_select, tournament_size))
+        if goal == 'max':
+            winners = np.argmax(pop_dist[contestants], axis=1)
+        else:
+            winners = np.argmin(pop_dist[contestants], axis=1)
+        return contestants[np.arange(num_select), winners]
+    if goal == 'max':
+        probs = pop_dist/np.max(pop_dist)
+    if goal == 'min':
+        probs = np.min(pop_dist)/pop_dist
+    return rng.choice(len(pop_dist), size=num_select, replace=False, p=probs/np.sum(probs))
+
+def _choose_parent(current_node, destinations, allowed, draws, successors1, successors2, mutation_rate):
+    """
+    Pick the next node of a crossover walk from the uniform random numbers of a step, or None for a dead end.
+    """
+    # Identify what destination have the parents at a current node.
+    dest1 = successors1[current_node]
+    dest2 = successors2[current_node]
+    # Check whether mutation happens. Only mutate when it is possible to mutate. 
+    non_parent = (destinations != dest1) & (destinations != dest2)
+    if (draws[0] < mutation_rate) and np.any(non_parent):
+        # Pick random non-parent destination to mutate.
+        candidates = np.flatnonzero(non_parent & allowed)
+        if len(candidates) == 0:
+            return None
+        return destinations[candidates[_pick(draws[1], len(candidates))]]
+    # Or use one of one of the parent.
+    if draws[1] < 0.5:
+        destination = dest1
+    else:
+        destination = dest2
+    if np.any(allowed & (destinations == destination)):
+        return destination
+    return None
+
+def _child_solution(start_node, end_node, num_nodes, node_graph, successors1, successors2, mutation_rate, rng,
+                    stats = None):
     
     path_out = None
     dist_out = None
-    while path_out is None:
-        j = 0
-        path = []
-        dist = 0
-        current_node = start_node
-        path.append(current_node)
-        while j <= num_nodes:
-            # Identify what destination have the parents at a current node.
-            dest1_index = np.where(np.array(parent1) == current_node)[0][0] + 1
-            dest1 = parent1[dest1_index]
-            dest2_index = np.where(np.array(parent2) == current_node)[0][0] + 1
-            dest2 = parent2[dest2_index]
-            # Check whether mutation happens. Only mutate when it is possible to mutate. 
-            destination_list = list(node_graph[current_node].keys())
-            destination_list = list(np.array(destination_list)[[d not in (dest1,dest2) for d in destination_list]])   
-            if (np.random.random() < mutation_rate) and len(destination_list) > 0:
-                # Pick random non-parent destination to mutate.
-                rd.shuffle(destination_list)
-            else: 
-                # Or use one of one of the parent.
-                if np.random.random()  < 0.5:
-                    destination_list = [dest1]
-                else:
-                    destination_list = [dest2]
-            k = 0 
-            max_dest = len(destination_list)
-            for destination in destination_list:
-                if (destination not in path) or ((destination == end_node) and (j == (num_nodes - 1))):
-                    path.append(destination)
-                    dist += node_graph[current_node][destination]
-                    current_node = destination
-                    j += 1
-                    break
-                else: 
-                    k += 1
-            if max_dest == k:
-                break
-        if (len(path) == (num_nodes + 1)):       
-            path_out = path
-            dist_out = dist
+    attempts = 0
+    while path_out is None and attempts < _CHILD_ATTEMPTS_PER_NODE * num_nodes:
+        attempts += 1
+        path_out, dist_out = _construct_tour(start_node, end_node, num_nodes, node_graph, rng,
+                                             (successors1, successors2, mutation_rate))
+        if stats is not None and path_out is None:
+            stats.count('child_retries')
     return path_out, dist_out
 
-def _produce_offspring(start_node, end_node, num_nodes, node_graph, pop_path, pop_dist, goal, mutation_rate):
+def _produce_offspring(start_node, end_node, num_nodes, node_graph, pop_path, pop_dist, goal, mutation_rate, rng,
+                       selection = 'roulette', tournament_size = 3, crossover = 'walk', stats = None):
     
-    off_pop_path = []  
-    off_pop_dist = []
+    if stats is not None:
+        phase_start = time.perf_counter()
+    pop_size = len(pop_dist)
     # Select number of parents. Ensure there are at least 2.
-    if np.maximum(np.floor(len(pop_dist)/2), 1) == 1:
+    if np.maximum(np.floor(pop_size/2), 1) == 1:
         num_parents = 2
     else:
-        num_parents = np.random.randint(1, np.maximum(np.floor(len(pop_dist)/2), 1)) * 2
-    if goal == 'max':
-        probs = np.array(pop_dist)/np.max(pop_dist)
-    if goal == 'min':
-        probs = 1/(np.array(pop_dist)/np.min(pop_dist)) 
-    i = 0
-    parent_index = []
+        num_parents = rng.integers(1, np.maximum(np.floor(pop_size/2), 1)) * 2
     # Selects indices that will become parents.
-    while i < num_parents:
-        j = 0
-        for prob in probs:
-            if (np.random.random() < prob) and j not in parent_index:
-                parent_index.append(j)
-                i += 1
-            if len(parent_index) == num_parents:
-                break
-            j += 1
-    # Produce offspring.
-    for k in np.arange(0, num_parents - 1):
-        parent1 = pop_path[parent_index[k]]
-        parent2 = pop_path[parent_index[k + 1]]
-        m = 0
-        while m < 2:                
-            child_path, child_dist = _child_solution(start_node, end_node, num_nodes, node_graph, parent1, parent2, mutation_rate)
-            if child_dist is not None:
-                off_pop_path.append(child_path)
-                off_pop_dist.append(child_dist)
-                m += 1
+    parent_index = _select(pop_dist, num_parents, goal, rng, selection, tournament_size)
+    if stats is not None:
+        now = time.perf_counter()
+        stats.add_time('selection', now - phase_start)
+        phase_start = now
+    if crossover == 'walk':
+        successors = _successors(pop_path[parent_index], node_graph.num_nodes)
+    # Produce offspring, two children for every pair of consecutive parents, up to the population size.
+    children = []
+    for k in range(num_parents - 1):
+        for _ in range(2):
+            if len(children) < pop_size:
+                if crossover == 'walk':
+                    child_path, _ = _child_solution(start_node, end_node, num_nodes, node_graph, successors[k],
+                                                    successors[k + 1], mutation_rate, rng, stats)
+                    if child_path is None:
+                        # The parents' edges lead to no path; the first parent takes the child's place.
+                        child_path = pop_path[parent_index[k]]
+                        if stats is not None:
+                            stats.count('child_fallbacks')
+                else:
+                    child_path = make_child(pop_path[parent_index[k]], pop_path[parent_index[k + 1]], node_graph,
+                                            crossover, mutation_rate, rng)
+                children.append(child_path)
+    if stats is not None:
+        now = time.perf_counter()
+        stats.add_time('crossover', now - phase_start)
+        stats.count('children', len(children))
+        phase_start = now
     # Fill the rest with parent generation.
-    rest_index = []
-    while len(off_pop_dist) < len(pop_dist):
-        n = 0
-        for prob in probs:
-            if (np.random.random() < prob) and n not in rest_index:
-                rest_index.append(j)
-                off_pop_path.append(pop_path[m])
-                off_pop_dist.append(pop_dist[m])     
-                n += 1
-            if len(rest_index) == len(pop_dist):
-                break
+    rest_index = _select(pop_dist, pop_size - len(children), goal, rng, selection, tournament_size)
+    off_pop_path = np.concatenate((np.array(children, dtype=np.int64).reshape(-1, pop_path.shape[1]),
+                                   pop_path[rest_index]))
+    if stats is None:
+        return off_pop_path, _evaluate_population(off_pop_path, node_graph)
+    now = time.perf_counter()
+    stats.add_time('selection', now - phase_start)
+    off_pop_dist = _evaluate_population(off_pop_path, node_graph)
+    stats.add_time('evaluation', time.perf_counter() - now)
     return off_pop_path, off_pop_dist
 
 def genetic_algorithm(start_node, end_node, num_nodes, node_graph, num_trials, goal = 'max',
-                      population_size = 0.20, mutation_rate = 0.01):
-    
+                      population_size = 0.20, mutation_rate = 0.01, rng = None, selection = 'roulette',
+                      tournament_size = 3, crossover = 'walk', initial = 'random', time_limit = None, patience = None,
+                      callback = None, should_stop = None, precheck = True, stats = False):
+    """
+    Implementation of a genetic algorithm to find longest or shortest solution.
+
+    Input:
+    start_node: int
+        starting node of a travelling salesman problem
+    end_node: int
+        end node of a travelling salesman problem 
+    num_nodes: int
+        number of nodes of an input graph
+    node_graph: dict or ArrayGraph
+        input graph generated by proprietary generate_graph() function or its array form
+    num_trails: int
+        number of generations
+    goal: string
+        use 'max' to return the longest or 'min' to run the shortest path
+    population_size: float
+        size of the population as a share of num_trials; at least 2
+    mutation_rate: float
+        probability that a child takes a destination that none of its parents take at a node,
+        or for crossover operators that a node swaps its position with a random node
+    rng: None, int, SeedSequence or Generator
+        random generator or seed, see Graphs.make_rng()
+    selection: string
+        'roulette' or 'tournament' selection of parents and survivors
+    tournament_size: int
+        number of contestants of every tournament
+    crossover: string
+        'walk' builds children by a random walk along the parents' edges, retrying until it succeeds;
+        'ox', 'pmx' or 'erx' use the operators of Crossover, which take linear time and always succeed
+    initial: string or list of string
+        'random' starts from random walks only; names of Construction heuristics ('nearest_neighbour',
+        'greedy_edge', 'space_filling_curve') each put their path in the starting population
+    time_limit: float or None
+        number of seconds after which the search stops and returns the best path found so far
+    patience: int or None
+        number of generations without a new best path after which the search stops
+    callback: function or None
+        called as callback(best_path, best_dist) with every new best path; returning True stops the search
+    should_stop: function or None
+        called without arguments after every iteration; returning True stops the search
+    precheck: boolean
+        run the tests of Feasibility first and return no path when they prove that none exists
+    stats: boolean
+        collect counters, phase timers and the improvement trajectory, returned as a last
+        Instrumentation.SolverStats output
+
+    Output:
+    best_path: list of int
+        a list of integers representing nodes of the best path of all generations
+    best_dist: int or float
+        distance of the best path
+    stats: SolverStats
+        only returned when stats is True
+    """
+    node_graph = as_array_graph(node_graph)
+    stats = SolverStats() if stats else None
+    if precheck and _infeasible(start_node, end_node, num_nodes, node_graph, stats):
+        return _finish(stats, None, None)
+    start_node = node_graph.index_of(start_node)
+    end_node = node_graph.index_of(end_node)
+    rng = make_rng(rng)
     # Generate starting population size.
     pop_size = np.maximum(round(population_size * num_trials), 2)    
-    pop_path, pop_dist = _random_search_population(start_node, end_node, num_nodes, node_graph, pop_size)
+    pop_path, pop_dist = _random_search_population(start_node, end_node, num_nodes, node_graph, pop_size, rng, stats)
+    seeded_path, seeded_dist = _seed_population(start_node, end_node, num_nodes, node_graph, pop_path, pop_size, initial,
+                                                goal, stats)
+    if seeded_dist is not None:
+        pop_path, pop_dist = seeded_path, seeded_dist
+    if stats is not None:
+        stats.add_time('initial_population', time.perf_counter() - stats.start)
+    if len(pop_path) == 0:
+        return _finish(stats, None, None)
+    # The starting population, with the paths of the initial heuristics, gives the first best path.
+    best_path, best_dist = _population_best(pop_path, pop_dist, goal)
+    stopping = _Stopping(goal, time_limit, patience, callback, stats, should_stop)
+    if stopping.check(best_path, best_dist, node_graph):
+        return _finish(stats, node_graph.path_labels(best_path), best_dist)
     # Create offspring populations.
     i = 0
     while i < num_trials:
         i += 1
-        pop_path, pop_dist = _produce_offspring(start_node, end_node, num_nodes, node_graph, pop_path, pop_dist, goal, mutation_rate)
-        best_path = None
-        best_dist = None
-        for j in np.arange(len(pop_dist)):
-            dist = pop_dist[j]
-            path = pop_path[j]
-            if goal == 'max':
-                if best_dist == None:
-                    best_dist = dist
-                    best_path = path
-                elif best_dist < dist:
-                    best_dist = dist
-                    best_path = path
-            if goal == 'min':
-                if best_dist == None:
-                    best_dist = dist
-                    best_path = path
-                elif best_dist > dist:
-                    best_dist = dist
-                    best_path = path
-    return best_path, best_dist
\ No newline at end of file
+        pop_path, pop_dist = _produce_offspring(start_node, end_node, num_nodes, node_graph, pop_path, pop_dist, goal,
+                                                mutation_rate, rng, selection, tournament_size, crossover, stats)
+        if stats is not None:
+            stats.count('generations')
+        best_path, best_dist = _population_best(pop_path, pop_dist, goal, best_path, best_dist)
+        if stopping.check(best_path, best_dist, node_graph):
+            break
+    if best_path is not None:
+        best_path = node_graph.path_labels(best_path)
+    return _finish(stats, best_path, best_dist)
+
+# Graph used by the island worker processes, set once per process by _init_island().
+_ISLAND_GRAPH = None
+
+def _init_island(node_graph):
+    
+    global _ISLAND_GRAPH
+    _ISLAND_GRAPH = node_graph
+
+def _island_epoch(task):
+    """
+    Evolve one island for a number of generations. Used by the worker processes of island_genetic_algorithm().
+
+    Input:
+    task: tuple
+        start node, end node, number of nodes, population paths (None to start a new population),
+        population distances, random generator, number of generations and genetic algorithm parameters
+
+    Output:
+    pop_path: 2D array of int32
+    pop_dist: array of float
+    rng: np.random.Generator
+        the random generator in its new state
+    best_path: array of int or None
+        best path of the epoch, from the starting population or any generation
+    best_dist: float or None
+    """
+    start_node, end_node, num_nodes, pop_path, pop_dist, rng, num_generations, params = task
+    node_graph = _ISLAND_GRAPH
+    if pop_path is None:
+        pop_path, pop_dist = _random_search_population(start_node, end_node, num_nodes, node_graph, params['pop_size'], rng)
+        seeded_path, seeded_dist = _seed_population(start_node, end_node, num_nodes, node_graph, pop_path,
+                                                    params['pop_size'], params['initial'], params['goal'])
+        if seeded_dist is not None:
+            pop_path, pop_dist = seeded_path, seeded_dist
+    pop_path = pop_path.astype(np.int64)
+    if len(pop_path) == 0:
+        # No path was found, so there is nothing to evolve.
+        num_generations = 0
+    best_path, best_dist = _population_best(pop_path, pop_dist, params['goal'])
+    for _ in range(num_generations):
+        pop_path, pop_dist = _produce_offspring(start_node, end_node, num_nodes, node_graph, pop_path, pop_dist,
+                                                params['goal'], params['mutation_rate'], rng, params['selection'],
+                                                params['tournament_size'], params['crossover'])
+        best_path, best_dist = _population_best(pop_path, pop_dist, params['goal'], best_path, best_dist)
+    # Tours travel between processes as compact int32 arrays.
+    return pop_path.astype(np.int32), pop_dist, rng, best_path, best_dist
+
+def _migrate(populations, goal, num_migrants, topology):
+    """
+    Copy the best paths of every island over the worst paths of the islands it sends to.
+
+    Input:
+    populations: list of (pop_path, pop_dist)
+        population of every island
+    goal: string
+        'max' or 'min'
+    num_migrants: int
+        number of paths every island sends to each island it is connected to
+    topology: string
+        'ring' sends from every island to the next one; 'all' sends from every island to all others
+    """
+    num_islands = len(populations)
+    order = [np.argsort(pop_dist) if goal == 'min' else np.argsort(-pop_dist) for _, pop_dist in populations]
+    migrants = [(pop_path[order[i][:num_migrants]], pop_dist[order[i][:num_migrants]])
+                for i, (pop_path, pop_dist) in enumerate(populations)]
+    migrated = []
+    for i, (pop_path, pop_dist) in enumerate(populations):
+        if topology == 'ring':
+            sources = [(i - 1) % num_islands]
+        else:
+            sources = [j for j in range(num_islands) if j != i]
+        incoming_path = np.concatenate([migrants[j][0] for j in sources])
+        incoming_dist = np.concatenate([migrants[j][1] for j in sources])
+        # Incoming paths replace the worst paths of the island.
+        worst = order[i][::-1][:min(len(incoming_dist), len(pop_dist) - 1)]
+        pop_path = pop_path.copy()
+        pop_dist = pop_dist.copy()
+        pop_path[worst] = incoming_path[:len(worst)]
+        pop_dist[worst] = incoming_dist[:len(worst)]
+        migrated.append((pop_path, pop_dist))
+    return migrated
+
+def island_genetic_algorithm(start_node, end_node, num_nodes, node_graph, num_trials, goal = 'max',
+                             population_size = 0.20, mutation_rate = 0.01, rng = None, selection = 'roulette',
+                             tournament_size = 3, crossover = 'walk', initial = 'random', num_islands = 4,
+                             migration_interval = 10, num_migrants = 2, topology = 'ring', num_workers = None,
+                             time_limit = None, patience = None, callback = None, should_stop = None,
+                             precheck = True, stats = False):
+    """
+    Implementation of an island model genetic algorithm: several populations evolve in separate worker
+    processes and exchange their best paths every migration_interval generations.
+
+    Islands run in synchronous epochs and every island has its own random stream spawned from rng, so
+    the result only depends on rng and num_islands, not on the number of workers.
+
+    Input:
+    start_node, end_node, num_nodes, node_graph, num_trials, goal, population_size, mutation_rate,
+    selection, tournament_size, crossover, initial:
+        as in genetic_algorithm(); num_trials is the number of generations and population_size applies
+        to every island, and every island is seeded with the paths of the initial heuristics
+    rng: None, int, SeedSequence or Generator
+        random generator or seed, see Graphs.make_rng()
+    num_islands: int
+        number of populations
+    migration_interval: int
+        number of generations between migrations
+    num_migrants: int
+        number of best paths an island sends to each island it is connected to
+    topology: string
+        'ring' or 'all' (all-to-all)
+    num_workers: int or None
+        number of worker processes; 1 runs in this process and None uses one process per island up to all cores
+    time_limit: float or None
+        number of seconds after which the search stops; it is checked between migrations
+    patience: int or None
+        number of migration intervals without a new best path after which the search stops
+    callback: function or None
+        called as callback(best_path, best_dist) with every new best path; returning True stops the search
+    should_stop: function or None
+        called without arguments between migrations; returning True stops the search
+    precheck: boolean
+        run the tests of Feasibility first and return no path when they prove that none exists
+    stats: boolean
+        collect the time spent in epochs and migrations, the number of generations and the improvement
+        trajectory over epochs, returned as a last Instrumentation.SolverStats output
+
+    Output:
+    best_path: list of int
+        a list of integers representing nodes of the best path found over all islands
+    best_dist: int or float
+        distance of the best path
+    stats: SolverStats
+        only returned when stats is True
+    """
+    node_graph = as_array_graph(node_graph)
+    stats = SolverStats() if stats else None
+    if precheck and _infeasible(start_node, end_node, num_nodes, node_graph, stats):
+        return _finish(stats, None, None)
+    start_node = node_graph.index_of(start_node)
+    end_node = node_graph.index_of(end_node)
+    seeds = np.random.SeedSequence(int(make_rng(rng).integers(2**63))).spawn(num_islands)
+    params = {'pop_size': np.maximum(round(population_size * num_trials), 2), 'goal': goal,
+              'mutation_rate': mutation_rate, 'selection': selection, 'tournament_size': tournament_size,
+              'crossover': crossover, 'initial': initial}
+    islands = [(None, None, np.random.default_rng(seed)) for seed in seeds]
+    if num_workers is None:
+        num_workers = min(num_islands, cpu_count())
+    pool = None
+    if num_workers > 1:
+        pool = Pool(num_workers, initializer=_init_island, initargs=(node_graph,))
+        run = pool.map
+    else:
+        _init_island(node_graph)
+        run = lambda function, tasks: list(map(function, tasks))
+    best_path = None
+    best_dist = None
+    stopping = _Stopping(goal, time_limit, patience, callback, stats, should_stop)
+    try:
+        generation = 0
+        while generation < num_trials:
+            num_generations = min(migration_interval, num_trials - generation)
+            generation += num_generations
+            tasks = [(start_node, end_node, num_nodes, pop_path, pop_dist, island_rng, num_generations, params)
+                     for pop_path, pop_dist, island_rng in islands]
+            if stats is not None:
+                epoch_start = time.perf_counter()
+            results = run(_island_epoch, tasks)
+            if stats is not None:
+                stats.add_time('epochs', time.perf_counter() - epoch_start)
+                stats.count('generations', num_generations)
+            islands = [(pop_path, pop_dist, island_rng) for pop_path, pop_dist, island_rng, _, _ in results]
+            # The best path of every epoch counts, including one of the starting populations.
+            for _, _, _, epoch_path, epoch_dist in results:
+                if epoch_path is not None:
+                    best_path, best_dist = _population_best([epoch_path], [epoch_dist], goal, best_path, best_dist)
+            if stopping.check(best_path, best_dist, node_graph):
+                break
+            if generation < num_trials and num_islands > 1:
+                if stats is not None:
+                    migration_start = time.perf_counter()
+                populations = _migrate([(pop_path, pop_dist) for pop_path, pop_dist, _ in islands], goal,
+                                       num_migrants, topology)
+                islands = [(pop_path, pop_dist, island[2]) for (pop_path, pop_dist), island in zip(populations, islands)]
+                if stats is not None:
+                    stats.add_time('migration', time.perf_counter() - migration_start)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    if best_path is not None:
+        best_path = node_graph.path_labels(best_path)
+    return _finish(stats, best_path, best_dist)
@@ -5,13 +5,40 @@ This code is to simulate large number of travelling salesman problems
 to be solved by the implemented algorithms. 
 """
 
+import glob
+import json
+import os
 import numpy as np
 import pandas as pd
 import seaborn as sns
 from itertools import chain
+from multiprocessing import Pool
+from os import cpu_count
 from Metaheuristics import random_search
+from Feasibility import check_feasibility
 from Graphs import generate_graph
 
+# Graphs of at most this many nodes that pass the feasibility tests are also checked exactly.
+_EXACT_CHECK_NODES = 10
+# Reasons a simulation found no paths: the failed test of Feasibility.check_feasibility(), or
+# 'not_found' when the graph passed the tests but the search found no path. Paths found give ''.
+REASONS = ('', 'min_degree', 'disconnected', 'bipartite_imbalance', 'cut_vertex', 'exact', 'not_found')
+
+class SimulationRecord(list):
+    """
+    Distances of the paths found in one simulation, with the reason none were found, see REASONS.
+    """
+
+    def __init__(self, distances = (), reason = ''):
+        super().__init__(distances)
+        self.reason = reason
+
+def _reason(record):
+    """
+    Return the reason of a record; plain lists of distances, e.g. from older runs, have none.
+    """
+    return getattr(record, 'reason', '' if len(record) else 'not_found')
+
 def _flatten_list(outer_list):
     """
     Function to flatten a list of lists into a list
@@ -24,26 +51,93 @@ def _flatten_list(outer_list):
             flat_list.append(element)
     return flat_list
 
-def simulate_graph_paths(random_seed, num_simulations, num_nodes, num_trials = 10000):
+def _simulate_task(task):
+    """
+    Run one simulation: generate a graph and collect the distances of random search paths.
+    Used by the worker processes, so it only depends on its own random stream.
+    Graphs that the feasibility tests reject are not searched.
+
+    Input:
+    task: tuple
+        number of nodes, SeedSequence of the simulation and number of trials
+
+    Output:
+    record: SimulationRecord
+    """
+    num_nodes, seed_sequence, num_trials = task
+    rng = np.random.default_rng(seed_sequence)
+    random_graph = generate_graph(num_nodes, symmetric=True, rng=rng, compact=True)
+    feasible, reason = check_feasibility(1, 1, num_nodes, random_graph, exact_nodes=_EXACT_CHECK_NODES)
+    if feasible is False:
+        return SimulationRecord([], reason)
+    _, _, data_d = random_search(1, 1, num_nodes, random_graph, num_trials, rng=rng, precheck=False)
+    return SimulationRecord(data_d['Distances'], '' if data_d['Distances'] else 'not_found')
+
+def _run_tasks(tasks, num_tasks, num_workers, chunksize):
+    """
+    Run simulation tasks and yield their results in task order.
+
+    Input:
+    tasks: iterable of tuples
+        tasks for _simulate_task()
+    num_tasks: int
+        number of tasks, used to pick a chunk size
+    num_workers: int or None
+        number of worker processes; 1 runs in this process and None uses all cores
+    chunksize: int or None
+        number of tasks sent to a worker at once; None picks about four chunks per worker
+    """
+    if num_workers is None:
+        num_workers = cpu_count()
+    if num_workers <= 1:
+        for task in tasks:
+            yield _simulate_task(task)
+        return
+    if chunksize is None:
+        chunksize = max(1, num_tasks // (4 * num_workers))
+    with Pool(num_workers) as pool:
+        for record in pool.imap(_simulate_task, tasks, chunksize):
+            yield record
+
+def iter_graph_paths(random_seed, num_simulations, num_nodes, num_trials = 10000, num_workers = 1, chunksize = None):
+    """
+    Yield the path distances of every simulation as soon as it is done, in simulation order.
+
+    Every simulation gets its own random stream spawned from SeedSequence(random_seed), so the
+    results do not depend on the number of workers.
+
+    Input:
+    random_seed: int
+        seed of the whole run
+    num_simulations: int
+        number of graphs to generate and search
+    num_nodes: int
+        number of nodes in every graph
+    num_trials: int
+        number of random walks of the random search, dead ends included; Num_Solutions counts the
+        distinct paths they found
+    num_workers: int or None
+        number of worker processes; 1 runs in this process and None uses all cores
+    chunksize: int or None
+        number of simulations sent to a worker at once
+    """
+    seeds = np.random.SeedSequence(random_seed).spawn(num_simulations)
+    tasks = ((num_nodes, seed, num_trials) for seed in seeds)
+    return _run_tasks(tasks, num_simulations, num_workers, chunksize)
+
+def simulate_graph_paths(random_seed, num_simulations, num_nodes, num_trials = 10000, num_workers = 1, chunksize = None):
     
-    np.random.seed(random_seed)
-    data_out = []
-    i = 0
-    while i < num_simulations:
-        i += 1
-        random_graph = generate_graph(num_nodes, symmetric=True)
-        _, _, data_d  = random_search(1, 1, num_nodes, random_graph, num_trials)
-        data_out.append(data_d['Distances'])
-    return data_out
+    return list(iter_graph_paths(random_seed, num_simulations, num_nodes, num_trials, num_workers, chunksize))
 
 def process_data(data_out):
 
-    dataset_out = {'Id': [],'Feasible':[], 'Num_Solutions': [], 'Max_Dist': [], 'Min_Dist': [], 'Median_Dist': []}
+    dataset_out = {'Id': [],'Feasible':[], 'Reason': [], 'Num_Solutions': [], 'Max_Dist': [], 'Min_Dist': [], 'Median_Dist': []}
     dist_out = []
     i = 0
     for record in data_out:
         # print(record)
         i += 1
+        dataset_out['Reason'].append(_reason(record))
         # Check whether any solution was find
         if len(record) == 0:
             dataset_out['Id'].append(i)
@@ -64,59 +158,422 @@ def process_data(data_out):
     return pd.DataFrame.from_dict(dataset_out), np.array(_flatten_list(dist_out), dtype=object)
 
 def plot_distances(dist_data):
-
+    """
+    Plot a histogram of distances, given as an array or as the DistanceAggregates of a streamed run.
+    """
+    if isinstance(dist_data, DistanceAggregates):
+        edges, counts = dist_data.histogram()
+        sns.histplot(x=edges[:-1], weights=counts, bins=edges)
+        return None
     sns.histplot(dist_data)
     return None
 
 
-def paths_by_nodes(random_seed, num_simulations, num_nodes_list, num_trials = 10000):
+_UNIT_HEADER = np.dtype([('node_index', np.int64), ('simulation', np.int64), ('reason', np.int64),
+                         ('length', np.int64)])
+# Version of the log format, part of the manifest so logs of an older format are not misread.
+_CHECKPOINT_FORMAT = 2
+
+class _Checkpoint:
+    """
+    Completed simulations of a campaign, appended to a log file as they finish.
+
+    Every unit is stored with the position of its number of nodes and its simulation index, which are
+    also the spawn key of its random stream, so a unit never has to be rerun to restore its state.
+    A unit cut short by a crash is dropped when the next unit is appended. The log is only opened
+    for writing then, so a campaign that is already complete can be read from a read-only directory.
+    """
+
+    def __init__(self, directory, manifest):
+        os.makedirs(directory, exist_ok=True)
+        manifest_path = os.path.join(directory, 'manifest.json')
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                if json.load(f) != manifest:
+                    raise ValueError('checkpoint {!r} belongs to a campaign with other parameters'.format(directory))
+        else:
+            with open(manifest_path, 'w') as f:
+                json.dump(manifest, f)
+        self.path = os.path.join(directory, 'units.bin')
+        # Only the position of every unit is kept; its distances are read when it is yielded.
+        self.done = {}
+        end = 0
+        if os.path.exists(self.path):
+            size = os.path.getsize(self.path)
+            with open(self.path, 'rb') as f:
+                while end + _UNIT_HEADER.itemsize <= size:
+                    f.seek(end)
+                    header = np.frombuffer(f.read(_UNIT_HEADER.itemsize), _UNIT_HEADER)[0]
+                    start = end + _UNIT_HEADER.itemsize
+                    stop = start + 8 * int(header['length'])
+                    if stop > size:
+                        break
+                    self.done[(int(header['node_index']), int(header['simulation']))] = \
+                        (start, int(header['length']), REASONS[int(header['reason'])])
+                    end = stop
+        self.end = end
+        self.file = None
+
+    def read(self, key):
+        """
+        Return the record of a completed unit.
+        """
+        start, length, reason = self.done[key]
+        with open(self.path, 'rb') as f:
+            f.seek(start)
+            record = np.frombuffer(f.read(8 * length), np.float64)
+        return SimulationRecord(record.tolist(), reason)
+
+    def add(self, key, record):
+        """
+        Append a completed unit and make sure it reached the disk.
+        """
+        if self.file is None:
+            self.file = open(self.path, 'ab')
+            self.file.truncate(self.end)
+        header = np.array([(key[0], key[1], REASONS.index(_reason(record)), len(record))], dtype=_UNIT_HEADER)
+        self.file.write(header.tobytes() + np.asarray(record, dtype=np.float64).tobytes())
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+def iter_paths_by_nodes(random_seed, num_simulations, num_nodes_list, num_trials = 10000, num_workers = 1, chunksize = None,
+                        checkpoint = None):
+    """
+    Yield (num_nodes, distances) of every simulation as soon as it is done, in simulation order.
+
+    Every number of nodes gets a child of SeedSequence(random_seed), and every simulation a
+    child of that, so the results do not depend on the number of workers.
+    With a checkpoint directory, every finished simulation is saved there; a rerun with the same
+    parameters reads the saved simulations back and only runs the missing ones, and yields the
+    same results as an uninterrupted run.
+
+    Input:
+    random_seed: int
+        seed of the whole run
+    num_simulations: int
+        number of graphs to generate and search for every number of nodes
+    num_nodes_list: list of int
+        numbers of nodes to simulate
+    num_trials: int
+        number of random walks of the random search, dead ends included; Num_Solutions counts the
+        distinct paths they found
+    num_workers: int or None
+        number of worker processes; 1 runs in this process and None uses all cores
+    chunksize: int or None
+        number of simulations sent to a worker at once
+    checkpoint: string or None
+        directory where finished simulations are saved; needs an int random_seed
+    """
+    if checkpoint is not None and (isinstance(random_seed, bool) or not isinstance(random_seed, (int, np.integer))):
+        raise ValueError('a checkpoint needs an int random_seed to reproduce the missing simulations')
+    node_seeds = np.random.SeedSequence(random_seed).spawn(len(num_nodes_list))
+    keys = [(k, j) for k in range(len(num_nodes_list)) for j in range(num_simulations)]
+    tasks = [(num_nodes, seed, num_trials)
+             for num_nodes, node_seed in zip(num_nodes_list, node_seeds)
+             for seed in node_seed.spawn(num_simulations)]
+    if checkpoint is None:
+        records = _run_tasks(iter(tasks), len(tasks), num_workers, chunksize)
+        return ((task[0], record) for task, record in zip(tasks, records))
+    manifest = {'random_seed': int(random_seed), 'num_simulations': int(num_simulations),
+                'num_nodes_list': [int(num_nodes) for num_nodes in num_nodes_list], 'num_trials': int(num_trials),
+                'format': _CHECKPOINT_FORMAT}
+    return _resume_tasks(_Checkpoint(checkpoint, manifest), keys, tasks, num_workers, chunksize)
+
+def _resume_tasks(checkpoint, keys, tasks, num_workers, chunksize):
+    """
+    Yield (num_nodes, distances) of all tasks in order, reading finished ones from the checkpoint and
+    running and saving the others.
+    """
+    missing = [task for key, task in zip(keys, tasks) if key not in checkpoint.done]
+    records = _run_tasks(iter(missing), len(missing), num_workers, chunksize)
+    try:
+        for key, task in zip(keys, tasks):
+            if key in checkpoint.done:
+                yield task[0], checkpoint.read(key)
+            else:
+                record = next(records)
+                checkpoint.add(key, record)
+                yield task[0], record
+    finally:
+        records.close()
+        checkpoint.close()
+
+def paths_by_nodes(random_seed, num_simulations, num_nodes_list, num_trials = 10000, num_workers = 1, chunksize = None,
+                   checkpoint = None):
     
-    np.random.seed(random_seed)
     data_out = {}
     for num_nodes in num_nodes_list:
-        i = 0
-        path_data = []
-        while i < num_simulations:
-            i += 1
-            random_graph = generate_graph(num_nodes, symmetric=True)
-            _, _, data_d  = random_search(1, 1, num_nodes, random_graph, num_trials)
-            path_data.append(data_d['Distances'])  
-        data_out[num_nodes] = path_data
+        data_out[num_nodes] = []
+    for num_nodes, record in iter_paths_by_nodes(random_seed, num_simulations, num_nodes_list, num_trials,
+                                                 num_workers, chunksize, checkpoint):
+        data_out[num_nodes].append(record)
     return data_out
 
+def _node_records(data_out):
+    """
+    Yield (num_nodes, distances) pairs from the output of paths_by_nodes() or iter_paths_by_nodes().
+    """
+    if isinstance(data_out, dict):
+        for num_nodes in list(data_out.keys()):
+            for record in data_out[num_nodes]:
+                yield num_nodes, record
+    else:
+        yield from data_out
+
 def paths_by_nodes_data(data_out):
 
-    dataset_out = {'Id': [], 'Num_Of_Nodes': [], 'Feasible':[], 'Num_Solutions': [], 'Max_Dist': [], 'Min_Dist': [], 'Median_Dist': []}
+    dataset_out = {'Id': [], 'Num_Of_Nodes': [], 'Feasible':[], 'Reason': [], 'Num_Solutions': [], 'Max_Dist': [], 'Min_Dist': [], 'Median_Dist': []}
     dist_out = {'Id':[],  'Num_Of_Nodes': [], 'Distance': []}
     
     i = 0
-    for num_nodes in list(data_out.keys()):
-        for record in data_out[num_nodes]:
-            # print(record)
-            i += 1
-            # Check whether any solution was find
-            if len(record) == 0:
-                dataset_out['Id'].append(i)
-                dataset_out['Num_Of_Nodes'].append(num_nodes)
-                dataset_out['Feasible'].append(0)
-                dataset_out['Num_Solutions'].append(np.nan)
-                dataset_out['Max_Dist'].append(np.nan)
-                dataset_out['Min_Dist'].append(np.nan)
-                dataset_out['Median_Dist'].append(np.nan)
-            else:
-                dataset_out['Id'].append(i)
-                dataset_out['Num_Of_Nodes'].append(num_nodes)
-                dataset_out['Feasible'].append(1)
-                dataset_out['Num_Solutions'].append(len(record))
-                dataset_out['Max_Dist'].append(np.amax(record))
-                dataset_out['Min_Dist'].append(np.amin(record))
-                dataset_out['Median_Dist'].append(np.median(record))
-                # This removes the empty lists 
-                dist_out['Id'].append(np.repeat(i, len(record)).tolist())
-                dist_out['Num_Of_Nodes'].append(np.repeat(num_nodes, len(record)).tolist())
-                dist_out['Distance'].append(record)
-    dist_out['Id'] = _flatten_list(dist_out['Id'])             
-    dist_out['Num_Of_Nodes'] = _flatten_list(dist_out['Num_Of_Nodes'])
-    dist_out['Distance'] = _flatten_list(dist_out['Distance'])
+    for num_nodes, record in _node_records(data_out):
+        # print(record)
+        i += 1
+        dataset_out['Reason'].append(_reason(record))
+        record = np.asarray(record)
+        # Check whether any solution was find
+        if len(record) == 0:
+            dataset_out['Id'].append(i)
+            dataset_out['Num_Of_Nodes'].append(num_nodes)
+            dataset_out['Feasible'].append(0)
+            dataset_out['Num_Solutions'].append(np.nan)
+            dataset_out['Max_Dist'].append(np.nan)
+            dataset_out['Min_Dist'].append(np.nan)
+            dataset_out['Median_Dist'].append(np.nan)
+        else:
+            dataset_out['Id'].append(i)
+            dataset_out['Num_Of_Nodes'].append(num_nodes)
+            dataset_out['Feasible'].append(1)
+            dataset_out['Num_Solutions'].append(len(record))
+            dataset_out['Max_Dist'].append(np.amax(record))
+            dataset_out['Min_Dist'].append(np.amin(record))
+            dataset_out['Median_Dist'].append(np.median(record))
+            # This removes the empty lists 
+            dist_out['Id'].append(np.full(len(record), i, dtype=np.int64))
+            dist_out['Num_Of_Nodes'].append(np.full(len(record), num_nodes, dtype=np.int64))
+            dist_out['Distance'].append(record)
+    # Columns are joined as arrays at once rather than flattened element by element.
+    for column in dist_out:
+        dist_out[column] = np.concatenate(dist_out[column]) if dist_out[column] else []
      
-    return pd.DataFrame.from_dict(dataset_out), pd.DataFrame.from_dict(dist_out)
\ No newline at end of file
+    return pd.DataFrame.from_dict(dataset_out), pd.DataFrame.from_dict(dist_out)
+
+# Columns of the per-simulation summaries and of the distance samples written by write_records().
+SUMMARY_DTYPE = np.dtype([('Id', np.int64), ('Num_Of_Nodes', np.int64), ('Feasible', np.int64),
+                          ('Reason', 'U{}'.format(max(len(reason) for reason in REASONS))), ('Num_Solutions', np.float64), ('Max_Dist', np.float64), ('Min_Dist', np.float64),
+                          ('Median_Dist', np.float64)])
+DISTANCE_DTYPE = np.dtype([('Id', np.int64), ('Num_Of_Nodes', np.int64), ('Distance', np.float64)])
+
+class DistanceAggregates:
+    """
+    Count, sum, minimum, maximum and histogram of distances, updated one record at a time.
+
+    The histogram has bins of bin_width starting at multiples of bin_width and grows as needed, so
+    medians and quantiles are exact to within a bin; with integer distances and bin_width 1 they are exact.
+    """
+
+    def __init__(self, bin_width = 1.0):
+        self.bin_width = bin_width
+        self.num_records = 0
+        self.num_feasible = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self.first_bin = 0
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    def update(self, record):
+        """
+        Add the distances of one simulation.
+        """
+        record = np.asarray(record, dtype=np.float64)
+        self.num_records += 1
+        if len(record) == 0:
+            return
+        self.num_feasible += 1
+        self.count += len(record)
+        self.total += float(np.sum(record))
+        self.min = min(self.min, float(np.min(record)))
+        self.max = max(self.max, float(np.max(record)))
+        bins = np.floor(record/self.bin_width).astype(np.int64)
+        low, high = int(bins.min()), int(bins.max())
+        if len(self.counts) == 0:
+            self.first_bin = low
+        if low < self.first_bin or high >= self.first_bin + len(self.counts):
+            new_first = min(low, self.first_bin)
+            new_counts = np.zeros(max(high, self.first_bin + len(self.counts) - 1) - new_first + 1, dtype=np.int64)
+            new_counts[self.first_bin - new_first:self.first_bin - new_first + len(self.counts)] = self.counts
+            self.first_bin, self.counts = new_first, new_counts
+        self.counts += np.bincount(bins - self.first_bin, minlength=len(self.counts))
+
+    def histogram(self):
+        """
+        Return the bin edges and counts of the histogram.
+        """
+        edges = (self.first_bin + np.arange(len(self.counts) + 1))*self.bin_width
+        return edges, self.counts
+
+    def quantile(self, q):
+        """
+        Return the lower edge of the bin that holds the q-quantile of all distances, or NaN without distances.
+        """
+        if self.count == 0:
+            return np.nan
+        position = np.searchsorted(np.cumsum(self.counts), q*(self.count - 1), side='right')
+        return (self.first_bin + position)*self.bin_width
+
+    @property
+    def median(self):
+        return self.quantile(0.5)
+
+    @property
+    def mean(self):
+        return self.total/self.count if self.count else np.nan
+
+    def save(self, file):
+        """
+        Write the aggregates to an .npz file.
+        """
+        np.savez(file, bin_width=self.bin_width, num_records=self.num_records, num_feasible=self.num_feasible,
+                 count=self.count, total=self.total, min=self.min, max=self.max, first_bin=self.first_bin,
+                 counts=self.counts)
+
+    @classmethod
+    def load(cls, file):
+        """
+        Read aggregates written by save().
+        """
+        with np.load(file) as data:
+            aggregates = cls(float(data['bin_width']))
+            for name in ('num_records', 'num_feasible', 'count', 'first_bin'):
+                setattr(aggregates, name, int(data[name]))
+            for name in ('total', 'min', 'max'):
+                setattr(aggregates, name, float(data[name]))
+            aggregates.counts = data['counts']
+        return aggregates
+
+def write_records(node_records, directory, chunk_rows = 1000000, bin_width = 1.0):
+    """
+    Write (num_nodes, distances) records to a directory of chunked .npy files as they arrive.
+
+    Summaries go to summary-NNNNN.npy and distance samples to distances-NNNNN.npy, each a structured
+    array with the columns of paths_by_nodes_data(); a chunk is written whenever chunk_rows rows are
+    waiting, so memory does not grow with the number of simulations. The aggregates of all distances
+    are written to aggregates.npz.
+
+    Input:
+    node_records: iterable of (int, list of float)
+        e.g. the output of iter_paths_by_nodes()
+    directory: string
+        output directory, created when missing; existing chunks are overwritten
+    chunk_rows: int
+        number of distance rows per chunk; summaries use the same limit
+    bin_width: float
+        bin width of the histogram of DistanceAggregates
+
+    Output:
+    aggregates: DistanceAggregates
+    """
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, 'summary-*.npy')) + glob.glob(os.path.join(directory, 'distances-*.npy')):
+        os.remove(path)
+    aggregates = DistanceAggregates(bin_width)
+    summaries = []
+    samples = []
+    num_samples = 0
+    chunk_ids = {'summary': 0, 'distances': 0}
+
+    def flush(kind, chunk):
+        np.save(os.path.join(directory, '{}-{:05d}.npy'.format(kind, chunk_ids[kind])), chunk)
+        chunk_ids[kind] += 1
+
+    i = 0
+    for num_nodes, record in node_records:
+        i += 1
+        reason = _reason(record)
+        record = np.asarray(record, dtype=np.float64)
+        aggregates.update(record)
+        if len(record) == 0:
+            summaries.append((i, num_nodes, 0, reason, np.nan, np.nan, np.nan, np.nan))
+        else:
+            summaries.append((i, num_nodes, 1, reason, len(record), np.amax(record), np.amin(record), np.median(record)))
+            sample = np.empty(len(record), dtype=DISTANCE_DTYPE)
+            sample['Id'] = i
+            sample['Num_Of_Nodes'] = num_nodes
+            sample['Distance'] = record
+            samples.append(sample)
+            num_samples += len(record)
+        if num_samples >= chunk_rows:
+            flush('distances', np.concatenate(samples))
+            samples, num_samples = [], 0
+        if len(summaries) >= chunk_rows:
+            flush('summary', np.array(summaries, dtype=SUMMARY_DTYPE))
+            summaries = []
+    if samples:
+        flush('distances', np.concatenate(samples))
+    if summaries:
+        flush('summary', np.array(summaries, dtype=SUMMARY_DTYPE))
+    aggregates.save(os.path.join(directory, 'aggregates.npz'))
+    return aggregates
+
+def stream_paths_by_nodes(directory, random_seed, num_simulations, num_nodes_list, num_trials = 10000, num_workers = 1,
+                          chunksize = None, chunk_rows = 1000000, bin_width = 1.0, checkpoint = None):
+    """
+    Run the simulations of paths_by_nodes() and write their results to a directory with write_records(),
+    without keeping them in memory. With a checkpoint directory, an interrupted run can be resumed.
+
+    Output:
+    aggregates: DistanceAggregates
+    """
+    records = iter_paths_by_nodes(random_seed, num_simulations, num_nodes_list, num_trials, num_workers, chunksize,
+                                  checkpoint)
+    return write_records(records, directory, chunk_rows, bin_width)
+
+def stream_graph_paths(directory, random_seed, num_simulations, num_nodes, num_trials = 10000, num_workers = 1,
+                       chunksize = None, chunk_rows = 1000000, bin_width = 1.0):
+    """
+    Run the simulations of simulate_graph_paths() and write their results to a directory with write_records(),
+    without keeping them in memory.
+
+    Output:
+    aggregates: DistanceAggregates
+    """
+    records = iter_graph_paths(random_seed, num_simulations, num_nodes, num_trials, num_workers, chunksize)
+    return write_records(((num_nodes, record) for record in records), directory, chunk_rows, bin_width)
+
+def _chunk_files(directory, kind):
+    return sorted(glob.glob(os.path.join(directory, '{}-*.npy'.format(kind))))
+
+def iter_distance_chunks(directory, mmap = True):
+    """
+    Yield the distance samples of a directory written by write_records() one chunk at a time, as DataFrames.
+    """
+    for path in _chunk_files(directory, 'distances'):
+        yield pd.DataFrame(np.load(path, mmap_mode='r' if mmap else None))
+
+def read_summary(directory):
+    """
+    Return the per-simulation summaries of a directory written by write_records(), as the first output
+    of paths_by_nodes_data().
+    """
+    chunks = [np.load(path) for path in _chunk_files(directory, 'summary')]
+    return pd.DataFrame(np.concatenate(chunks) if chunks else np.empty(0, dtype=SUMMARY_DTYPE))
+
+def read_distances(directory):
+    """
+    Return all distance samples of a directory written by write_records(), as the second output of
+    paths_by_nodes_data(). Use iter_distance_chunks() when they do not fit in memory.
+    """
+    chunks = [np.load(path) for path in _chunk_files(directory, 'distances')]
+    return pd.DataFrame(np.concatenate(chunks) if chunks else np.empty(0, dtype=DISTANCE_DTYPE))
+
+def read_aggregates(directory):
+    """
+    Return the DistanceAggregates of a directory written by write_records().
+    """
+    return DistanceAggregates.load(os.path.join(directory, 'aggregates.npz'))
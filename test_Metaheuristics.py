@@ -0,0 +1,32 @@
+"""
+TESTS OF THE METAHEURISTIC ALGORITHMS
+
+Run with python -m pytest from this directory.
+"""
+
+import numpy as np
+import pytest
+from Construction import construct_tour
+from Graphs import GeometricGraph
+from Metaheuristics import genetic_algorithm, island_genetic_algorithm, random_search
+
+@pytest.mark.parametrize('goal', ['min', 'max'])
+@pytest.mark.parametrize('solver', [genetic_algorithm, island_genetic_algorithm])
+def test_seeded_population_is_never_lost(solver, goal):
+    node_graph = GeometricGraph(np.random.default_rng(0).random((60, 2)) * 100)
+    _, seed_dist = construct_tour(1, 1, 60, node_graph, 'greedy_edge', goal)
+    extra = {'num_workers': 1} if solver is island_genetic_algorithm else {}
+    _, best_dist = solver(1, 1, 60, node_graph, 5, goal, population_size=2.0, rng=1, crossover='ox',
+                          initial='greedy_edge', **extra)
+    if goal == 'min':
+        assert best_dist <= seed_dist
+    else:
+        assert best_dist >= seed_dist
+
+def test_random_search_counts_every_walk():
+    # Walks that turn to node 3 first reach a dead end at node 2, as its only successor is visited.
+    node_graph = {1: {2: 1, 3: 1}, 2: {3: 1}, 3: {2: 1, 4: 1}, 4: {1: 1}}
+    _, _, data_out, stats = random_search(1, 1, 4, node_graph, 200, 'min', rng=0, stats=True)
+    assert stats.counters['tours_constructed'] + stats.counters['dead_ends'] == 200
+    assert stats.counters['dead_ends'] > 0
+    assert data_out['Paths'] == [[1, 2, 3, 4, 1]]